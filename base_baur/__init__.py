@@ -1,3 +1,4 @@
 # -*- coding: utf-8 -*-
 # Powered by Mindphin Technologies.
-from . import models
\ No newline at end of file
+from . import models
+from . import wizard
@@ -2,7 +2,7 @@
 # Powered by Mindphin Technologies.
 {
     'name': '(sd) Baur Report',
-    'version': '1.0',
+    'version': '1.3',
     "summary": '',
     'description': """ """,
     "category": "Sales",
@@ -12,9 +12,17 @@
     'depends': ['sale_management'],
     'data': [
         'security/ir.model.access.csv',
+        'data/sale_condition_data.xml',
+        'data/ir_cron.xml',
         'views/product_template.xml',
         'views/account_move.xml',
+        'views/account_move_installment.xml',
+        'views/res_config_settings.xml',
         'views/sale.xml',
+        'views/sale_condition.xml',
+        'wizard/sale_order_template_apply.xml',
+        'views/sale_order_template_apply_run.xml',
+        'views/sale_invoicing_run.xml',
         'report/invoice_report_views.xml',
         'report/sale_report_views.xml',
     ],
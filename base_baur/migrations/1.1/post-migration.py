@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import api, SUPERUSER_ID
+
+BATCH_SIZE = 1000
+
+
+def migrate(cr, version):
+    """Store the installments of the invoices posted before the table
+    existed."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    move_ids = env['account.move'].search([('state', '=', 'posted')]).ids
+    for start in range(0, len(move_ids), BATCH_SIZE):
+        env['account.move'].browse(move_ids[start:start + BATCH_SIZE])._update_installments()
+        env['account.move'].flush()
+        env['account.move'].invalidate_cache()
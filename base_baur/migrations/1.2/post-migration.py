@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo.addons.base_baur.models.sale_condition import CONDITION_FIELDS
+
+# table of the documents, column of their condition lines, and condition
+# telling the documents confirmed, whose shown blocks keep their own texts
+TABLES = [
+    ('sale_order_template', 'template_id', "false"),
+    ('sale_order', 'order_id', "t.state IN ('sale', 'done')"),
+    ('account_move', 'move_id', "t.state = 'posted'"),
+]
+
+
+def _get_columns(cr, table):
+    cr.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+    return {row[0] for row in cr.fetchall()}
+
+
+def migrate(cr, version):
+    """Move the condition blocks stored in columns of the documents to
+    condition lines, then drop the columns.
+
+    A line is kept for the blocks shown or whose texts differ from the
+    default ones; an emptied text is kept as an empty custom text. The shown
+    blocks of confirmed documents keep all their texts, so that changing a
+    default later on does not change them (see ``_freeze_conditions``).
+    """
+    for table, fk, confirmed in TABLES:
+        columns = _get_columns(cr, table)
+        dropped = []
+        for code, fnames in CONDITION_FIELDS.items():
+            show, sep, label, text = [fname if fname in columns else None for fname in fnames]
+            if not (show or sep or label or text):
+                continue
+            show_value = "COALESCE(t.%s, false)" % show if show else "false"
+            frozen = "(%s AND %s)" % (show_value, confirmed)
+
+            def custom(column, attr):
+                if not column:
+                    return frozen
+                return "(%s OR NULLIF(t.%s, '') IS DISTINCT FROM NULLIF(c.%s, ''))" % (frozen, column, attr)
+
+            def value(column, attr):
+                if not column:
+                    return "CASE WHEN %s THEN c.%s END" % (frozen, attr)
+                return "CASE WHEN %s THEN NULLIF(t.%s, '') END" % (custom(column, attr), column)
+
+            cr.execute("""
+                INSERT INTO sale_condition_line (condition_id, {fk}, show, sep, label, text,
+                                                 sep_custom, label_custom, text_custom,
+                                                 create_uid, create_date, write_uid, write_date)
+                SELECT * FROM (
+                    SELECT c.id AS condition_id, t.id AS res_id, {show} AS show,
+                           {sep} AS sep, {label} AS label, {text} AS text,
+                           {sep_custom} AS sep_custom, {label_custom} AS label_custom, {text_custom} AS text_custom,
+                           1 AS create_uid, now() AT TIME ZONE 'UTC' AS create_date,
+                           1 AS write_uid, now() AT TIME ZONE 'UTC' AS write_date
+                      FROM {table} t
+                      JOIN sale_condition c ON c.code = %s
+                ) lines
+                WHERE show OR sep_custom OR label_custom OR text_custom
+            """.format(
+                fk=fk, table=table, show=show_value,
+                sep=value(sep, 'sep'), label=value(label, 'label'), text=value(text, 'text'),
+                sep_custom=custom(sep, 'sep'), label_custom=custom(label, 'label'), text_custom=custom(text, 'text'),
+            ), (code,))
+            dropped += [column for column in (show, sep, label, text) if column]
+        for column in dropped:
+            cr.execute('ALTER TABLE "%s" DROP COLUMN IF EXISTS "%s"' % (table, column))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+TABLES = ['sale_order_template', 'sale_order', 'account_move']
+
+
+def migrate(cr, version):
+    """Move the free texts stored on the documents to shared text bodies,
+    one per distinct text, then drop the free text columns. The texts were
+    sanitized when written, so they are hashed as they are."""
+    for table in TABLES:
+        cr.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'freier_text'", (table,))
+        if not cr.fetchone():
+            continue
+        cr.execute("""
+            INSERT INTO text_body (checksum, body, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT encode(sha256(convert_to(freier_text, 'UTF8')), 'hex'), freier_text,
+                   1, now() AT TIME ZONE 'UTC', 1, now() AT TIME ZONE 'UTC'
+              FROM {table}
+             WHERE COALESCE(freier_text, '') != ''
+            ON CONFLICT (checksum) DO NOTHING
+        """.format(table=table))
+        cr.execute("""
+            UPDATE {table} t
+               SET freier_text_body_id = b.id
+              FROM text_body b
+             WHERE b.checksum = encode(sha256(convert_to(t.freier_text, 'UTF8')), 'hex')
+        """.format(table=table))
+        cr.execute('ALTER TABLE "%s" DROP COLUMN "freier_text"' % table)
@@ -1,4 +1,11 @@
 # -*- coding: utf-8 -*-
 # Powered by Mindphin Technologies.
+from . import sale_condition
+from . import text_body
 from . import sale
 from . import product_template
+from . import res_company
+from . import res_config_settings
+from . import account_move_installment
+from . import sale_invoicing_run
+from . import sale_order_template_apply_run
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields, models, tools
+from odoo.tools.misc import groupby
+
+
+class AccountMoveInstallment(models.Model):
+    _name = "account.move.installment"
+    _description = "Invoice Installment"
+    _order = "date, move_id, sequence"
+
+    move_id = fields.Many2one('account.move', string="Invoice", required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer(default=1)
+    date = fields.Date(string="Due Date", required=True, index=True)
+    amount = fields.Monetary(string="Amount", currency_field='company_currency_id')
+    amount_currency = fields.Monetary(string="Amount in Currency", currency_field='currency_id')
+    discount_percentage = fields.Float(string="Discount %")
+    discount_date = fields.Date(string="Discount Date", index=True)
+    discount_balance = fields.Monetary(string="Discounted Amount", currency_field='company_currency_id')
+    discount_amount_currency = fields.Monetary(string="Discounted Amount in Currency", currency_field='currency_id')
+    currency_id = fields.Many2one(related='move_id.currency_id', store=True)
+    company_id = fields.Many2one(related='move_id.company_id', store=True, index=True)
+    company_currency_id = fields.Many2one(related='company_id.currency_id')
+    partner_id = fields.Many2one(related='move_id.partner_id', store=True, index=True)
+    move_type = fields.Selection(related='move_id.move_type', store=True)
+    payment_state = fields.Selection(related='move_id.payment_state', store=True)
+
+    def init(self):
+        # "what is due between two dates" and "which discounts expire on a
+        # date" are range scans per company over these indexes
+        tools.create_index(self._cr, 'account_move_installment_company_date_index', self._table, ['company_id', 'date'])
+        tools.create_index(self._cr, 'account_move_installment_company_discount_date_index', self._table, ['company_id', 'discount_date'])
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    installment_ids = fields.One2many('account.move.installment', 'move_id', string="Installments", readonly=True, copy=False)
+
+    def _update_installments(self):
+        """Replace the stored installments of the moves by their receivable
+        (or payable) lines, one installment per line with its due date and
+        amounts, so that they always agree with what is actually due.
+        The early payment discount of an installment comes from the schedule
+        of the payment term on the same due date, computed per payment term
+        for all the moves at once. Only posted invoices have installments.
+        The installments are derived data, kept up to date whatever the
+        access rights of the user posting or resetting the invoices."""
+        self.installment_ids.sudo().unlink()
+        invoices = self.filtered(lambda move: move.state == 'posted' and move.is_invoice(include_receipts=True))
+        vals_list = []
+        for (payment_term, company), moves in groupby(invoices, lambda move: (move.invoice_payment_term_id, move.company_id)):
+            if payment_term:
+                schedules = payment_term._compute_terms_batch(company, [{
+                    'date_ref': move.invoice_date or move.date,
+                    'currency': move.currency_id,
+                    'tax_amount': abs(move.amount_tax_signed),
+                    'tax_amount_currency': move.amount_tax,
+                    'sign': 1,
+                    'untaxed_amount': abs(move.amount_untaxed_signed),
+                    'untaxed_amount_currency': move.amount_untaxed,
+                } for move in moves])
+            else:
+                schedules = [[] for move in moves]
+            for move, schedule in zip(moves, schedules):
+                discounts = {}
+                for term in schedule:
+                    discounts.setdefault(fields.Date.to_date(term['date']), term)
+                default_date = move.invoice_date_due or move.invoice_date or move.date
+                lines = move.line_ids.filtered(lambda line: line.account_id.user_type_id.type in ('receivable', 'payable'))
+                lines = lines.sorted(lambda line: (line.date_maturity or default_date, line.id))
+                for sequence, line in enumerate(lines, 1):
+                    date = line.date_maturity or default_date
+                    term = discounts.get(date, {})
+                    vals_list.append({
+                        'move_id': move.id,
+                        'sequence': sequence,
+                        'date': date,
+                        'amount': abs(line.balance),
+                        'amount_currency': abs(line.amount_currency),
+                        'discount_percentage': term.get('discount_percentage', 0.0),
+                        'discount_date': term.get('discount_date') or False,
+                        'discount_balance': term.get('discount_balance', 0.0),
+                        'discount_amount_currency': term.get('discount_amount_currency', 0.0),
+                    })
+        return self.env['account.move.installment'].sudo().create(vals_list)
+
+    def _post(self, soft=True):
+        posted = super(AccountMove, self)._post(soft)
+        posted._update_installments()
+        return posted
+
+    def button_draft(self):
+        res = super(AccountMove, self).button_draft()
+        self.installment_ids.sudo().unlink()
+        return res
+
+    def button_cancel(self):
+        res = super(AccountMove, self).button_cancel()
+        self.installment_ids.sudo().unlink()
+        return res
+
+    def write(self, vals):
+        res = super(AccountMove, self).write(vals)
+        if {'invoice_payment_term_id', 'invoice_date', 'invoice_date_due'} & set(vals):
+            self.filtered(lambda move: move.state == 'posted')._update_installments()
+        return res
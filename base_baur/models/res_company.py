@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields, models
+
+
+class ResCompany(models.Model):
+    _inherit = "res.company"
+
+    early_pay_discount_computation = fields.Selection([
+        ('included', 'On early payment'),
+        ('excluded', 'Never'),
+        ('mixed', 'Always (upon invoice)'),
+    ], string="Cash Discount Tax Reduction", default='included', required=True)
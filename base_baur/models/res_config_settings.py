@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = "res.config.settings"
+
+    early_pay_discount_computation = fields.Selection(related='company_id.early_pay_discount_computation', readonly=False)
@@ -1,13 +1,70 @@
 # -*- coding: utf-8 -*-
 # Powered by Mindphin Technologies.
 
+import functools
 from datetime import timedelta
 
-from odoo import fields, models, api
+from markupsafe import Markup
+
+from odoo import fields, models, api, tools, _
+from odoo.exceptions import ValidationError
 from dateutil.relativedelta import relativedelta
-from odoo.tools import format_date, formatLang, frozendict
+from odoo.tools import float_round, format_date, formatLang, frozendict
 
 from odoo.tools import is_html_empty
+from odoo.tools.misc import groupby
+
+from .sale_condition import CONDITION_FIELDS
+
+# fields of the orders given to their invoices
+INVOICE_FIELDS = [
+    'x_studio_ausmessen_liefern_und_montieren',
+    'ausmessen_liefern_und_montieren_text',
+    'x_studio_reparieren_ersetzen_von',
+    'reparieren_ersetzen_von_text',
+    'garantie',
+    'garantie_sep',
+    'garantie_label',
+    'garantie_text',
+    'garantie_wiederverkaufer',
+    'garantie_wiederverkaufer_sep',
+    'garantie_wiederverkaufer_label',
+    'garantie_wiederverkaufer_text',
+    'freier_text_block_id',
+    'freier_text_body_id',
+]
+
+EXAMPLE_PREVIEW_LINE = Markup(
+    "<div style='margin-left: 20px;'><b>{index}#</b> Installment of <b>{amount}</b> "
+    "on <b style='color: #704A66;'>{date}</b>{discount}</div>"
+)
+EXAMPLE_PREVIEW_DISCOUNT = Markup(" (<b>{amount}</b> if paid before <b>{date}</b>)")
+
+
+@functools.lru_cache(maxsize=16384)
+def get_due_date(date_ref, months, days, end_month, days_after, option='day_after_invoice_date', day_of_the_month=0):
+    """Return the due date of a payment term line from the date of the move.
+    The days are counted as the standard option of the line says, so that
+    the terms set up with it keep their due dates.
+    The dates are memoized on all the values they depend on, so that a line
+    whose delays are changed never gets a stale date."""
+    due_date = date_ref + relativedelta(months=months)
+    if option == 'after_invoice_month':
+        due_date += relativedelta(day=1, months=1, days=days - 1)
+    elif option == 'day_following_month':
+        due_date += relativedelta(day=days, months=1)
+    elif option == 'day_current_month':
+        due_date += relativedelta(day=days)
+    else:
+        due_date += relativedelta(days=days)
+        if day_of_the_month > 0:
+            months_delta = 1 if day_of_the_month < due_date.day else 0
+            due_date += relativedelta(day=day_of_the_month, months=months_delta)
+    if end_month:
+        due_date += relativedelta(day=31)
+        due_date += relativedelta(days=days_after)
+    return due_date
+
 
 class AccountPaymentTerm(models.Model):
     _inherit = "account.payment.term"
@@ -31,41 +88,56 @@ class AccountPaymentTerm(models.Model):
             payment_term.example_invalid = len(payment_term.line_ids.filtered(lambda l: l.value == 'balance')) != 1
 
     @api.depends('example_amount', 'example_date', 'line_ids.value', 'line_ids.value_amount',
-                 'line_ids.days')
+                 'line_ids.days', 'line_ids.option', 'line_ids.day_of_the_month',
+                 'line_ids.months', 'line_ids.end_month', 'line_ids.days_after',
+                 'line_ids.discount_percentage', 'line_ids.discount_days')
     def _compute_example_preview(self):
+        company = self.env.company
         for record in self:
-            example_preview = ""
-            if not record.example_invalid:
-                currency = self.env.company.currency_id
-                terms = record._compute_terms(
-                    date_ref=record.example_date,
-                    currency=currency,
-                    company=self.env.company,
-                    tax_amount=0,
-                    tax_amount_currency=0,
-                    untaxed_amount=record.example_amount,
-                    untaxed_amount_currency=record.example_amount,
-                    sign=1)
-                for i, info_by_dates in enumerate(record._get_amount_by_date(terms, currency).values()):
-                    date = info_by_dates['date']
-                    discount_date = info_by_dates['discount_date']
-                    amount = info_by_dates['amount']
-                    discount_amount = info_by_dates['discounted_amount'] or 0.0
-                    example_preview += f"""
-                        <div style='margin-left: 20px;'>
-                            <b>{i+1}#</b>
-                            Installment of
-                            <b>{formatLang(self.env, amount, monetary=True, currency_obj=currency)}</b>
-                            on 
-                            <b style='color: #704A66;'>{date}</b>
-                    """
-                    if discount_date:
-                        example_preview += f"""
-                         (<b>{formatLang(self.env, discount_amount, monetary=True, currency_obj=currency)}</b> if paid before <b>{format_date(self.env, terms[i].get('discount_date'))}</b>)
-                    """
-                    example_preview += "</div>"
-
-            record.example_preview = example_preview
+            if record.example_invalid:
+                record.example_preview = ""
+                continue
+            record.example_preview = record._get_example_preview(
+                record._origin.id, record._get_example_preview_key(), record.example_amount,
+                record.example_date, company.currency_id.id, self.env.lang, company.id,
+                company.early_pay_discount_computation)
+
+    def _get_example_preview_key(self):
+        """Return the values of the lines the schedule depends on, so that a
+        preview is only reused for the very same lines, saved or not."""
+        self.ensure_one()
+        return tuple(
+            (line.value, line.value_amount, line.days, line.option, line.day_of_the_month, line.months,
+             line.end_month, line.days_after, line.discount_percentage, line.discount_days)
+            for line in self.line_ids.sorted(lambda line: line.value == 'balance')
+        )
+
+    @tools.ormcache('term_id', 'lines_key', 'amount', 'date', 'currency_id', 'lang', 'company_id', 'early_pay_discount_computation')
+    def _get_example_preview(self, term_id, lines_key, amount, date, currency_id, lang, company_id, early_pay_discount_computation):
+        currency = self.env['res.currency'].browse(currency_id)
+        terms = self._compute_terms(
+            date_ref=date,
+            currency=currency,
+            company=self.env['res.company'].browse(company_id),
+            tax_amount=0,
+            tax_amount_currency=0,
+            untaxed_amount=amount,
+            untaxed_amount_currency=amount,
+            sign=1)
+        example_preview = Markup()
+        for i, info_by_dates in enumerate(self._get_amount_by_date(terms, currency).values()):
+            discount = Markup()
+            if info_by_dates['discount_date']:
+                discount = EXAMPLE_PREVIEW_DISCOUNT.format(
+                    amount=formatLang(self.env, info_by_dates['discounted_amount'] or 0.0, monetary=True, currency_obj=currency),
+                    date=info_by_dates['discount_date'])
+            example_preview += EXAMPLE_PREVIEW_LINE.format(
+                index=i + 1,
+                amount=formatLang(self.env, info_by_dates['amount'], monetary=True, currency_obj=currency),
+                date=info_by_dates['date'],
+                discount=discount)
+        return example_preview
+
     @api.model
     def _get_amount_by_date(self, terms, currency):
         """
@@ -99,6 +171,32 @@ class AccountPaymentTerm(models.Model):
             if terms.line_ids.filtered(lambda r: r.value == 'fixed' and r.discount_percentage):
                 raise ValidationError(_("You can't mix fixed amount with early payment percentage"))
 
+    def compute(self, value, date_ref=False, currency=None):
+        """Get the due dates and amounts of the payment terms lines of a move,
+        as the moves compute them when they are posted. They come from the
+        same schedule as the installments and the example preview."""
+        self.ensure_one()
+        date_ref = fields.Date.to_date(date_ref) or fields.Date.context_today(self)
+        if not currency and self.env.context.get('currency_id'):
+            currency = self.env['res.currency'].browse(self.env.context['currency_id'])
+        elif not currency:
+            currency = self.env.company.currency_id
+        terms = self._compute_terms_batch(self.company_id or self.env.company, [{
+            'date_ref': date_ref,
+            'currency': currency,
+            'tax_amount': 0.0,
+            'tax_amount_currency': 0.0,
+            'sign': -1 if value < 0 else 1,
+            'untaxed_amount': value,
+            'untaxed_amount_currency': value,
+        }])[0]
+        result = [(fields.Date.to_string(term['date']), currency.round(term['foreign_amount'])) for term in terms]
+        dist = currency.round(value - sum(amount for date, amount in result))
+        if dist:
+            last_date = result and result[-1][0] or fields.Date.context_today(self)
+            result.append((last_date, dist))
+        return result
+
     def _compute_terms(self, date_ref, currency, company, tax_amount, tax_amount_currency, sign, untaxed_amount, untaxed_amount_currency):
         """Get the distribution of this payment term.
         :param date_ref: The move date to take into account
@@ -112,69 +210,117 @@ class AccountPaymentTerm(models.Model):
         :return (list<tuple<datetime.date,tuple<float,float>>>): the amount in the company's currency and
             the document's currency, respectively for each required payment date
         """
+        return self._compute_terms_batch(company, [{
+            'date_ref': date_ref,
+            'currency': currency,
+            'tax_amount': tax_amount,
+            'tax_amount_currency': tax_amount_currency,
+            'sign': sign,
+            'untaxed_amount': untaxed_amount,
+            'untaxed_amount_currency': untaxed_amount_currency,
+        }])[0]
+
+    def _compute_terms_batch(self, company, moves_values):
+        """Get the distribution of this payment term for many moves at once,
+        with the same result as ``_compute_terms`` called for each of them.
+        The lines are sorted and read once, their due dates are computed once
+        per distinct reference date and the currencies' rounding is looked up
+        once per currency.
+        :param company: the company issuing the moves
+        :param moves_values: list of dicts holding, for each move, the other
+            parameters of ``_compute_terms`` (date_ref, currency, tax_amount,
+            tax_amount_currency, sign, untaxed_amount, untaxed_amount_currency)
+        :return: list of the distributions, in the order of ``moves_values``
+        """
         self.ensure_one()
-        company_currency = company.currency_id
-        tax_amount_left = tax_amount
-        tax_amount_currency_left = tax_amount_currency
-        untaxed_amount_left = untaxed_amount
-        untaxed_amount_currency_left = untaxed_amount_currency
-        total_amount = tax_amount + untaxed_amount
-        total_amount_currency = tax_amount_currency + untaxed_amount_currency
-        result = []
-
-        for line in self.line_ids.sorted(lambda line: line.value == 'balance'):
-            term_vals = {
-                'date': line._get_due_date(date_ref),
-                'has_discount': line.discount_percentage,
-                'discount_date': None,
-                'discount_amount_currency': 0.0,
-                'discount_balance': 0.0,
-                'discount_percentage': line.discount_percentage,
-            }
-
-            if line.value == 'fixed':
-                term_vals['company_amount'] = sign * company_currency.round(line.value_amount)
-                term_vals['foreign_amount'] = sign * currency.round(line.value_amount)
-                company_proportion = tax_amount/untaxed_amount if untaxed_amount else 1
-                foreign_proportion = tax_amount_currency/untaxed_amount_currency if untaxed_amount_currency else 1
-                line_tax_amount = company_currency.round(line.value_amount * company_proportion) * sign
-                line_tax_amount_currency = currency.round(line.value_amount * foreign_proportion) * sign
-                line_untaxed_amount = term_vals['company_amount'] - line_tax_amount
-                line_untaxed_amount_currency = term_vals['foreign_amount'] - line_tax_amount_currency
-            elif line.value == 'percent':
-                term_vals['company_amount'] = company_currency.round(total_amount * (line.value_amount / 100.0))
-                term_vals['foreign_amount'] = currency.round(total_amount_currency * (line.value_amount / 100.0))
-                line_tax_amount = company_currency.round(tax_amount * (line.value_amount / 100.0))
-                line_tax_amount_currency = currency.round(tax_amount_currency * (line.value_amount / 100.0))
-                line_untaxed_amount = term_vals['company_amount'] - line_tax_amount
-                line_untaxed_amount_currency = term_vals['foreign_amount'] - line_tax_amount_currency
-            else:
-                line_tax_amount = line_tax_amount_currency = line_untaxed_amount = line_untaxed_amount_currency = 0.0
-
-            tax_amount_left -= line_tax_amount
-            tax_amount_currency_left -= line_tax_amount_currency
-            untaxed_amount_left -= line_untaxed_amount
-            untaxed_amount_currency_left -= line_untaxed_amount_currency
-
-            if line.value == 'balance':
-                term_vals['company_amount'] = tax_amount_left + untaxed_amount_left
-                term_vals['foreign_amount'] = tax_amount_currency_left + untaxed_amount_currency_left
-                line_tax_amount = tax_amount_left
-                line_tax_amount_currency = tax_amount_currency_left
-                line_untaxed_amount = untaxed_amount_left
-                line_untaxed_amount_currency = untaxed_amount_currency_left
-
-            if line.discount_percentage:
-                if company.early_pay_discount_computation in ('excluded', 'mixed'):
-                    term_vals['discount_balance'] = company_currency.round(term_vals['company_amount'] - line_untaxed_amount * line.discount_percentage / 100.0)
-                    term_vals['discount_amount_currency'] = currency.round(term_vals['foreign_amount'] - line_untaxed_amount_currency * line.discount_percentage / 100.0)
+        # (line, value, value_amount, discount percentage, dates by date_ref)
+        lines = [
+            (line, line.value, line.value_amount, line.discount_percentage, {})
+            for line in self.line_ids.sorted(lambda line: line.value == 'balance')
+        ]
+        discount_excluded = any(line[3] for line in lines) and company.early_pay_discount_computation in ('excluded', 'mixed')
+        roundings = {}
+
+        def get_round(currency):
+            if currency.id not in roundings:
+                precision_rounding = currency.rounding
+                roundings[currency.id] = lambda amount: float_round(amount, precision_rounding=precision_rounding)
+            return roundings[currency.id]
+
+        company_round = get_round(company.currency_id)
+        results = []
+        for values in moves_values:
+            date_ref = values['date_ref']
+            currency_round = get_round(values['currency'])
+            sign = values['sign']
+            tax_amount = tax_amount_left = values['tax_amount']
+            tax_amount_currency = tax_amount_currency_left = values['tax_amount_currency']
+            untaxed_amount = untaxed_amount_left = values['untaxed_amount']
+            untaxed_amount_currency = untaxed_amount_currency_left = values['untaxed_amount_currency']
+            total_amount = tax_amount + untaxed_amount
+            total_amount_currency = tax_amount_currency + untaxed_amount_currency
+            result = []
+
+            for line, value, value_amount, discount_percentage, dates in lines:
+                if date_ref not in dates:
+                    dates[date_ref] = (
+                        line._get_due_date(date_ref),
+                        date_ref + relativedelta(days=line.discount_days) if discount_percentage else None,
+                    )
+                due_date, discount_date = dates[date_ref]
+                term_vals = {
+                    'date': due_date,
+                    'has_discount': discount_percentage,
+                    'discount_date': None,
+                    'discount_amount_currency': 0.0,
+                    'discount_balance': 0.0,
+                    'discount_percentage': discount_percentage,
+                }
+
+                if value == 'fixed':
+                    term_vals['company_amount'] = sign * company_round(value_amount)
+                    term_vals['foreign_amount'] = sign * currency_round(value_amount)
+                    company_proportion = tax_amount/untaxed_amount if untaxed_amount else 1
+                    foreign_proportion = tax_amount_currency/untaxed_amount_currency if untaxed_amount_currency else 1
+                    line_tax_amount = company_round(value_amount * company_proportion) * sign
+                    line_tax_amount_currency = currency_round(value_amount * foreign_proportion) * sign
+                    line_untaxed_amount = term_vals['company_amount'] - line_tax_amount
+                    line_untaxed_amount_currency = term_vals['foreign_amount'] - line_tax_amount_currency
+                elif value == 'percent':
+                    term_vals['company_amount'] = company_round(total_amount * (value_amount / 100.0))
+                    term_vals['foreign_amount'] = currency_round(total_amount_currency * (value_amount / 100.0))
+                    line_tax_amount = company_round(tax_amount * (value_amount / 100.0))
+                    line_tax_amount_currency = currency_round(tax_amount_currency * (value_amount / 100.0))
+                    line_untaxed_amount = term_vals['company_amount'] - line_tax_amount
+                    line_untaxed_amount_currency = term_vals['foreign_amount'] - line_tax_amount_currency
                 else:
-                    term_vals['discount_balance'] = company_currency.round(term_vals['company_amount'] * (1 - (line.discount_percentage / 100.0)))
-                    term_vals['discount_amount_currency'] = currency.round(term_vals['foreign_amount'] * (1 - (line.discount_percentage / 100.0)))
-                term_vals['discount_date'] = date_ref + relativedelta(days=line.discount_days)
+                    line_tax_amount = line_tax_amount_currency = line_untaxed_amount = line_untaxed_amount_currency = 0.0
+
+                tax_amount_left -= line_tax_amount
+                tax_amount_currency_left -= line_tax_amount_currency
+                untaxed_amount_left -= line_untaxed_amount
+                untaxed_amount_currency_left -= line_untaxed_amount_currency
+
+                if value == 'balance':
+                    term_vals['company_amount'] = tax_amount_left + untaxed_amount_left
+                    term_vals['foreign_amount'] = tax_amount_currency_left + untaxed_amount_currency_left
+                    line_tax_amount = tax_amount_left
+                    line_tax_amount_currency = tax_amount_currency_left
+                    line_untaxed_amount = untaxed_amount_left
+                    line_untaxed_amount_currency = untaxed_amount_currency_left
+
+                if discount_percentage:
+                    if discount_excluded:
+                        term_vals['discount_balance'] = company_round(term_vals['company_amount'] - line_untaxed_amount * discount_percentage / 100.0)
+                        term_vals['discount_amount_currency'] = currency_round(term_vals['foreign_amount'] - line_untaxed_amount_currency * discount_percentage / 100.0)
+                    else:
+                        term_vals['discount_balance'] = company_round(term_vals['company_amount'] * (1 - (discount_percentage / 100.0)))
+                        term_vals['discount_amount_currency'] = currency_round(term_vals['foreign_amount'] * (1 - (discount_percentage / 100.0)))
+                    term_vals['discount_date'] = discount_date
 
-            result.append(term_vals)
-        return result
+                result.append(term_vals)
+            results.append(result)
+        return results
 
 
 class AccountPaymentTermLine(models.Model):
@@ -182,18 +328,15 @@ class AccountPaymentTermLine(models.Model):
 
     months = fields.Integer(string='Months', required=True, default=0)
     end_month = fields.Boolean(string='End of month', help="Switch to end of the month after having added months or days")
+    days_after = fields.Integer(string='Days after End of month', help="Days to add after the end of the month")
     discount_percentage = fields.Float(string='Discount %', help='Early Payment Discount granted for this line')
+    discount_days = fields.Integer(string='Discount Days', default=10, help='Number of days before the early payment proposition expires')
 
 
     def _get_due_date(self, date_ref):
         self.ensure_one()
-        due_date = fields.Date.from_string(date_ref)
-        due_date += relativedelta(months=self.months)
-        due_date += relativedelta(days=self.days)
-        if self.end_month:
-            due_date += relativedelta(day=31)
-            due_date += relativedelta(days=self.days_after)
-        return due_date
+        return get_due_date(fields.Date.from_string(date_ref), self.months, self.days, self.end_month, self.days_after,
+                            self.option, self.day_of_the_month)
 
 
 class TextBlocks(models.Model):
@@ -204,7 +347,8 @@ class TextBlocks(models.Model):
 
 
 class SaleOrderTemplate(models.Model):
-    _inherit = "sale.order.template"
+    _name = "sale.order.template"
+    _inherit = ["sale.order.template", "sale.condition.mixin", "text.body.mixin"]
 
     x_studio_lieferfrist = fields.Selection(
         [
@@ -219,57 +363,56 @@ class SaleOrderTemplate(models.Model):
             ('4 - 6 Wochen', '4 - 6 Wochen'),
         ]
     )
-    termin = fields.Boolean(string="Show Termin")
-    termin_sep = fields.Char(default="Termin")
-    termin_label = fields.Char(default="Termin:")
-    termin_text = fields.Text(string="Termin Text", default="nach Vereinbarung")
-    abholung = fields.Boolean(string="Show Abholung")
-    abholung_sep = fields.Char(default="Abholung")
-    abholung_label = fields.Char(default="Abholung:")
-    abholung_text = fields.Text(string="Abholung Text", default="ab Werkstatt, Uttigen")
-    preise_sonderfarben = fields.Boolean(string="Show Preise Sonderfarben")
-    preise_sonderfarben_sep = fields.Char(default="Preise Sonderfarben")
-    preise_sonderfarben_label = fields.Char(default="Preise Sonderfarben:")
-    preise_sonderfarben_text = fields.Text(string="Preise Sonderfarben Text", default="gültig 4 Wochen")
-    x_studio_preise_inkl_montage = fields.Boolean(string="Show Preise inkl. Montage")
-    preise_inkl_montage_sep = fields.Char(default="Preise inkl. Montage")
-    preise_inkl_montage_label = fields.Char(default="Preise:")
-    preise_inkl_montage_text = fields.Text(string="Preise inkl. Montage Text", default="inkl. Montage")
-    preise_exkl_montage = fields.Boolean(string="Show Preise exkl. Montage")
-    preise_exkl_montage_sep = fields.Char(default="Preise exkl. Montage")
-    preise_exkl_montage_label = fields.Char(default="Preise:")
-    preise_exkl_montage_text = fields.Text(string="Preise exkl. Montage Text", default="exkl. Montage")
-    rabatt_5 = fields.Boolean(string="Show Rabatt 5%")
-    rabatt_5_sep = fields.Char(default="Rabatt 5%")
-    rabatt_5_label = fields.Char(default="Rabatt:")
-    rabatt_5_text = fields.Text(string="Rabatt 5% Text", default="5% ab einem Bestellwert von CHF 2'000.- exkl. Sonderfarben und exkl. Reparaturen")
-    rabatt_10_sep = fields.Char(default="Rabatt 10%")
-    rabatt_10 = fields.Boolean(string="Show Rabatt 10%")
-    rabatt_10_sep = fields.Char(default="Rabatt 10%")
-    rabatt_10_label = fields.Char(default="Rabatt:")
-    rabatt_10_text = fields.Text(string="Rabatt 10% Text", default="10% ab einem Bestellwert von CHF 3'000.- exkl. Sonderfarben und exkl. Reparaturen")
-    rabatt_40 = fields.Boolean(string="Show Rabatt 40%")
-    rabatt_40_sep = fields.Char(default="Rabatt 40%")
-    rabatt_40_label = fields.Char(default="Rabatt:")
-    rabatt_40_text = fields.Text(string="Rabatt 40% Text", default="40% Wiederverkaufsrabatt exkl. Sonderfarben und exkl. Montage/Reparatur")
-    rabatt_u = fields.Boolean(string="Show Rabatt U")
-    rabatt_u_sep = fields.Char(default="Rabatt U")
-    rabatt_u_label = fields.Char(default="Rabatt:")
-    rabatt_u_text = fields.Text(string="Rabatt U Text", default="5% Uttiger Rabatt bereits in Abzug gebracht")
-    rabattreduktion = fields.Boolean(string="Show Rabattreduktion")
-    rabattreduktion_sep = fields.Char(default="Rabattreduktion")
-    rabattreduktion_label = fields.Char(default="Rabatt- Reduktion:")
-    rabattreduktion_text = fields.Text(string="Rabattreduktion Text", default="Wird ein zweites Ausmass erforderlich, kann sich der Mengenrabatt reduzieren oder entfällt ganz")
-    garantie = fields.Boolean(string="Show Garantie")
-    garantie_sep = fields.Char(default="Garantie")
-    garantie_label = fields.Char(default="Garantie:")
-    garantie_text = fields.Text(string="Garantie Text", default="3 Jahre Garantie auf Material (exkl. auf Gewebe)")
-    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_sep = fields.Char(default="Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_label = fields.Char(default="Garantie:")
-    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", default="3 Jahre Garantie auf Produkte (exkl. auf Gewebe) Schäden durch unsachgemässe Montage sind nicht garantieberechtigt")
+    condition_line_ids = fields.One2many('sale.condition.line', 'template_id', string="Condition Blocks", copy=True)
+    termin = fields.Boolean(string="Show Termin", compute='_compute_conditions', readonly=False)
+    termin_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    termin_label = fields.Char(compute='_compute_conditions', readonly=False)
+    termin_text = fields.Text(string="Termin Text", compute='_compute_conditions', readonly=False)
+    abholung = fields.Boolean(string="Show Abholung", compute='_compute_conditions', readonly=False)
+    abholung_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    abholung_label = fields.Char(compute='_compute_conditions', readonly=False)
+    abholung_text = fields.Text(string="Abholung Text", compute='_compute_conditions', readonly=False)
+    preise_sonderfarben = fields.Boolean(string="Show Preise Sonderfarben", compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_text = fields.Text(string="Preise Sonderfarben Text", compute='_compute_conditions', readonly=False)
+    x_studio_preise_inkl_montage = fields.Boolean(string="Show Preise inkl. Montage", compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_text = fields.Text(string="Preise inkl. Montage Text", compute='_compute_conditions', readonly=False)
+    preise_exkl_montage = fields.Boolean(string="Show Preise exkl. Montage", compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_text = fields.Text(string="Preise exkl. Montage Text", compute='_compute_conditions', readonly=False)
+    rabatt_5 = fields.Boolean(string="Show Rabatt 5%", compute='_compute_conditions', readonly=False)
+    rabatt_5_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_5_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_5_text = fields.Text(string="Rabatt 5% Text", compute='_compute_conditions', readonly=False)
+    rabatt_10 = fields.Boolean(string="Show Rabatt 10%", compute='_compute_conditions', readonly=False)
+    rabatt_10_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_10_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_10_text = fields.Text(string="Rabatt 10% Text", compute='_compute_conditions', readonly=False)
+    rabatt_40 = fields.Boolean(string="Show Rabatt 40%", compute='_compute_conditions', readonly=False)
+    rabatt_40_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_40_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_40_text = fields.Text(string="Rabatt 40% Text", compute='_compute_conditions', readonly=False)
+    rabatt_u = fields.Boolean(string="Show Rabatt U", compute='_compute_conditions', readonly=False)
+    rabatt_u_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_u_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_u_text = fields.Text(string="Rabatt U Text", compute='_compute_conditions', readonly=False)
+    rabattreduktion = fields.Boolean(string="Show Rabattreduktion", compute='_compute_conditions', readonly=False)
+    rabattreduktion_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabattreduktion_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabattreduktion_text = fields.Text(string="Rabattreduktion Text", compute='_compute_conditions', readonly=False)
+    garantie = fields.Boolean(string="Show Garantie", compute='_compute_conditions', readonly=False)
+    garantie_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_text = fields.Text(string="Garantie Text", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", compute='_compute_conditions', readonly=False)
     freier_text_block_id = fields.Many2one('text.blocks', 'Freier Text Block')
-    freier_text = fields.Html('Freier Text')
     ausmessen_liefern_und_montieren = fields.Boolean(string="Ausmessen, liefern und montieren")
     ausmessen_liefern_und_montieren_text = fields.Char(string="Ausmessen, liefern und montieren", default="Ausmessen, liefern und montieren")
     reparieren_ersetzen_von = fields.Boolean(string="Reparieren / Ersetzen von")
@@ -286,61 +429,96 @@ class SaleOrderTemplate(models.Model):
         if self.freier_text_block_id:
             self.freier_text = self.freier_text_block_id.text_block
 
+    def _get_sale_order_values(self, with_header=False):
+        """Return the values the template gives to an order besides its lines:
+        the conditions (the texts of a condition only when it is shown), the
+        free text and the pricelist. ``with_header`` adds the values the
+        standard template onchange sets, for orders updated outside of the
+        form."""
+        self.ensure_one()
+        values = {}
+        if self.pricelist_id:
+            values['pricelist_id'] = self.pricelist_id.id
+        values['x_studio_lieferfrist'] = self.x_studio_lieferfrist
+        for code, (show, sep, label, text) in CONDITION_FIELDS.items():
+            if show not in self._fields:
+                continue
+            values[show] = self[show]
+            if self[show]:
+                values.update({fname: self[fname] for fname in (sep, label, text) if fname})
+        values.update({
+            'freier_text_block_id': self.freier_text_block_id.id,
+            'freier_text_body_id': self.freier_text_body_id.id,
+            'x_studio_ausmessen_liefern_und_montieren': self.ausmessen_liefern_und_montieren,
+            'x_studio_reparieren_ersetzen_von': self.reparieren_ersetzen_von,
+        })
+        if with_header:
+            values.update({
+                'sale_order_template_id': self.id,
+                'require_signature': self.require_signature,
+                'require_payment': self.require_payment,
+            })
+            if self.number_of_days > 0:
+                values['validity_date'] = fields.Date.context_today(self) + timedelta(self.number_of_days)
+            if not is_html_empty(self.note):
+                values['note'] = self.note
+        return values
+
 
 class SaleOrder(models.Model):
-    _inherit = "sale.order"
-
-    termin = fields.Boolean(string="Show Termin")
-    termin_sep = fields.Char(default="Termin")
-    termin_label = fields.Char(default="Termin:")
-    termin_text = fields.Text(string="Termin Text", default="nach Vereinbarung")
-    abholung = fields.Boolean(string="Show Abholung")
-    abholung_sep = fields.Char(default="Abholung")
-    abholung_label = fields.Char(default="Abholung:")
-    abholung_text = fields.Text(string="Abholung Text", default="ab Werkstatt, Uttigen")
-    preise_sonderfarben = fields.Boolean(string="Show Preise Sonderfarben")
-    preise_sonderfarben_sep = fields.Char(default="Preise Sonderfarben")
-    preise_sonderfarben_label = fields.Char(default="Preise Sonderfarben:")
-    preise_sonderfarben_text = fields.Text(string="Preise Sonderfarben Text", default="gültig 4 Wochen")
-    x_studio_preise_inkl_montage = fields.Boolean(string="Show Preise inkl. Montage")
-    preise_inkl_montage_sep = fields.Char(default="Preise inkl. Montage")
-    preise_inkl_montage_label = fields.Char(default="Preise:")
-    preise_inkl_montage_text = fields.Text(string="Preise inkl. Montage Text", default="inkl. Montage")
-    preise_exkl_montage = fields.Boolean(string="Show Preise exkl. Montage")
-    preise_exkl_montage_sep = fields.Char(default="Preise exkl. Montage")
-    preise_exkl_montage_label = fields.Char(default="Preise:")
-    preise_exkl_montage_text = fields.Text(string="Preise exkl. Montage Text", default="exkl. Montage")
-    rabatt_5 = fields.Boolean(string="Show Rabatt 5%")
-    rabatt_5_sep = fields.Char(default="Rabatt 5%")
-    rabatt_5_label = fields.Char(default="Rabatt:")
-    rabatt_5_text = fields.Text(string="Rabatt 5% Text", default="5% ab einem Bestellwert von CHF 2'000.- exkl. Sonderfarben und exkl. Reparaturen")
-    rabatt_10_sep = fields.Char(default="Rabatt 10%")
-    rabatt_10 = fields.Boolean(string="Show Rabatt 10%")
-    rabatt_10_sep = fields.Char(default="Rabatt 10%")
-    rabatt_10_label = fields.Char(default="Rabatt:")
-    rabatt_10_text = fields.Text(string="Rabatt 10% Text", default="10% ab einem Bestellwert von CHF 3'000.- exkl. Sonderfarben und exkl. Reparaturen")
-    rabatt_40 = fields.Boolean(string="Show Rabatt 40%")
-    rabatt_40_sep = fields.Char(default="Rabatt 40%")
-    rabatt_40_label = fields.Char(default="Rabatt:")
-    rabatt_40_text = fields.Text(string="Rabatt 40% Text", default="40% Wiederverkaufsrabatt exkl. Sonderfarben und exkl. Montage/Reparatur")
-    rabatt_u = fields.Boolean(string="Show Rabatt U")
-    rabatt_u_sep = fields.Char(default="Rabatt U")
-    rabatt_u_label = fields.Char(default="Rabatt:")
-    rabatt_u_text = fields.Text(string="Rabatt U Text", default="5% Uttiger Rabatt bereits in Abzug gebracht")
-    rabattreduktion = fields.Boolean(string="Show Rabattreduktion")
-    rabattreduktion_sep = fields.Char(default="Rabattreduktion")
-    rabattreduktion_label = fields.Char(default="Rabatt- Reduktion:")
-    rabattreduktion_text = fields.Text(string="Rabattreduktion Text", default="Wird ein zweites Ausmass erforderlich, kann sich der Mengenrabatt reduzieren oder entfällt ganz")
-    garantie = fields.Boolean(string="Show Garantie")
-    garantie_sep = fields.Char(default="Garantie")
-    garantie_label = fields.Char(default="Garantie:")
-    garantie_text = fields.Text(string="Garantie Text", default="3 Jahre Garantie auf Material (exkl. auf Gewebe)")
-    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_sep = fields.Char(default="Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_label = fields.Char(default="Garantie:")
-    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", default="3 Jahre Garantie auf Produkte (exkl. auf Gewebe) Schäden durch unsachgemässe Montage sind nicht garantieberechtigt")
+    _name = "sale.order"
+    _inherit = ["sale.order", "sale.condition.mixin", "text.body.mixin"]
+
+    condition_line_ids = fields.One2many('sale.condition.line', 'order_id', string="Condition Blocks", copy=True)
+    termin = fields.Boolean(string="Show Termin", compute='_compute_conditions', readonly=False)
+    termin_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    termin_label = fields.Char(compute='_compute_conditions', readonly=False)
+    termin_text = fields.Text(string="Termin Text", compute='_compute_conditions', readonly=False)
+    abholung = fields.Boolean(string="Show Abholung", compute='_compute_conditions', readonly=False)
+    abholung_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    abholung_label = fields.Char(compute='_compute_conditions', readonly=False)
+    abholung_text = fields.Text(string="Abholung Text", compute='_compute_conditions', readonly=False)
+    preise_sonderfarben = fields.Boolean(string="Show Preise Sonderfarben", compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_sonderfarben_text = fields.Text(string="Preise Sonderfarben Text", compute='_compute_conditions', readonly=False)
+    x_studio_preise_inkl_montage = fields.Boolean(string="Show Preise inkl. Montage", compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_inkl_montage_text = fields.Text(string="Preise inkl. Montage Text", compute='_compute_conditions', readonly=False)
+    preise_exkl_montage = fields.Boolean(string="Show Preise exkl. Montage", compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_label = fields.Char(compute='_compute_conditions', readonly=False)
+    preise_exkl_montage_text = fields.Text(string="Preise exkl. Montage Text", compute='_compute_conditions', readonly=False)
+    rabatt_5 = fields.Boolean(string="Show Rabatt 5%", compute='_compute_conditions', readonly=False)
+    rabatt_5_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_5_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_5_text = fields.Text(string="Rabatt 5% Text", compute='_compute_conditions', readonly=False)
+    rabatt_10 = fields.Boolean(string="Show Rabatt 10%", compute='_compute_conditions', readonly=False)
+    rabatt_10_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_10_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_10_text = fields.Text(string="Rabatt 10% Text", compute='_compute_conditions', readonly=False)
+    rabatt_40 = fields.Boolean(string="Show Rabatt 40%", compute='_compute_conditions', readonly=False)
+    rabatt_40_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_40_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_40_text = fields.Text(string="Rabatt 40% Text", compute='_compute_conditions', readonly=False)
+    rabatt_u = fields.Boolean(string="Show Rabatt U", compute='_compute_conditions', readonly=False)
+    rabatt_u_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_u_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabatt_u_text = fields.Text(string="Rabatt U Text", compute='_compute_conditions', readonly=False)
+    rabattreduktion = fields.Boolean(string="Show Rabattreduktion", compute='_compute_conditions', readonly=False)
+    rabattreduktion_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    rabattreduktion_label = fields.Char(compute='_compute_conditions', readonly=False)
+    rabattreduktion_text = fields.Text(string="Rabattreduktion Text", compute='_compute_conditions', readonly=False)
+    garantie = fields.Boolean(string="Show Garantie", compute='_compute_conditions', readonly=False)
+    garantie_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_text = fields.Text(string="Garantie Text", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", compute='_compute_conditions', readonly=False)
     freier_text_block_id = fields.Many2one('text.blocks', 'Freier Text Block')
-    freier_text = fields.Html('Freier Text')
     ausmessen_liefern_und_montieren_text = fields.Char(string="Ausmessen, liefern und montieren", default="Ausmessen, liefern und montieren")
     reparieren_ersetzen_von_text = fields.Char(string="Reparieren / Ersetzen von", default="Reparieren / Ersetzen von")
 
@@ -351,64 +529,37 @@ class SaleOrder(models.Model):
             self.freier_text = self.freier_text_block_id.text_block
 
     def action_condition_text_add(self):
-        for record in self:
-            if record.termin:
-                record.termin_text = "nach Vereinbarung"
-            if record.abholung:
-                record.abholung_text = "ab Werkstatt, Uttigen"
-            if record.preise_sonderfarben:
-                record.preise_sonderfarben_text = "gültig 4 Wochen"
-            if record.x_studio_preise_inkl_montage:
-                record.preise_inkl_montage_text = "inkl. Montage"
-            if record.preise_exkl_montage:
-                record.preise_exkl_montage_text = "exkl. Montage"
-            if record.rabatt_5:
-                record.rabatt_5_text = "5% ab einem Bestellwert von CHF 2'000.- exkl. Sonderfarben und exkl. Reparaturen"
-            if record.rabatt_10:
-                record.rabatt_10_text = "10% ab einem Bestellwert von CHF 3'000.- exkl. Sonderfarben und exkl. Reparaturen"
-            if record.rabatt_40:
-                record.rabatt_40_text = "40% Wiederverkaufsrabatt exkl. Sonderfarben und exkl. Montage/Reparatur"
-            if record.rabatt_u:
-                record.rabatt_u_text = "5% Uttiger Rabatt bereits in Abzug gebracht"
-            if record.rabattreduktion:
-                record.rabattreduktion_text = "Wird ein zweites Ausmass erforderlich, kann sich der Mengenrabatt reduzieren oder entfällt ganz"
-            if record.garantie:
-                record.garantie_text = "3 Jahre Garantie auf Material (exkl. auf Gewebe)"
-            if record.garantie_wiederverkaufer:
-                record.garantie_wiederverkaufer_text = "3 Jahre Garantie auf Produkte (exkl. auf Gewebe) Schäden durch unsachgemässe Montage sind nicht garantieberechtigt"
-
-    @api.onchange('sale_order_template_id')
-    def onchange_sale_order_template_id(self):
-        #res = super(SaleOrder, self).onchange_sale_order_template_id()
-
-        if not self.sale_order_template_id:
-            self.require_signature = self._get_default_require_signature()
-            self.require_payment = self._get_default_require_payment()
-            return
-
-        template = self.sale_order_template_id.with_context(lang=self.partner_id.lang)
-
-        # --- first, process the list of products from the template
-        order_lines = []
-        if not self.sale_order_template_id.remove_order_existing_line:
-            order_lines = []
-        else:
-            order_lines = [(5, 0, 0)]
+        """Reset the text of the conditions shown on the orders to the default
+        text of the condition block. The texts are only stored when they
+        differ from the defaults, so this clears them on all the orders with
+        a single write; confirmed orders then get the defaults copied again."""
+        lines = self.condition_line_ids.filtered(lambda line: line.show and line.text_custom)
+        lines.write({'text': False, 'text_custom': False})
+        self._get_confirmed_records()._freeze_conditions()
+
+    def _get_confirmed_records(self):
+        return self.filtered(lambda order: order.state in ('sale', 'done'))
+
+    def action_confirm(self):
+        res = super(SaleOrder, self).action_confirm()
+        self._get_confirmed_records()._freeze_conditions()
+        return res
 
-        for line in template.sale_order_template_line_ids:
+    def _get_template_line_commands(self, template):
+        """Return the commands creating the lines of ``template`` on the
+        order, priced with the order's pricelist."""
+        order_lines = [(5, 0, 0)] if template.remove_order_existing_line else []
+        template_lines = template.sale_order_template_line_ids
+        prices = self._get_template_line_prices(template_lines)
+        customer_leads = {}
+        for line in template_lines:
             data = self._compute_line_data_for_template_change(line)
 
             if line.product_id:
-                price = line.product_id.lst_price
-                discount = 0
-
-                if self.pricelist_id:
-                    pricelist_price = self.pricelist_id.with_context(uom=line.product_uom_id.id).get_product_price(line.product_id, 1, False)
-
-                    if self.pricelist_id.discount_policy == 'without_discount' and price:
-                        discount = max(0, (price - pricelist_price) * 100 / price)
-                    else:
-                        price = pricelist_price
+                price, discount = prices[line.id]
+                product_template = line.product_id.product_tmpl_id
+                if product_template not in customer_leads:
+                    customer_leads[product_template] = self._get_customer_lead(product_template)
 
                 data.update({
                     'price_unit': price,
@@ -416,21 +567,82 @@ class SaleOrder(models.Model):
                     'product_uom_qty': line.product_uom_qty,
                     'product_id': line.product_id.id,
                     'product_uom': line.product_uom_id.id,
-                    'customer_lead': self._get_customer_lead(line.product_id.product_tmpl_id),
+                    'customer_lead': customer_leads[product_template],
                 })
 
             order_lines.append((0, 0, data))
+        return order_lines
+
+    def _get_template_option_commands(self, template):
+        return [(0, 0, self._compute_option_data_for_template_change(option)) for option in template.sale_order_template_option_ids]
+
+    def _apply_sale_order_template(self, template):
+        """Apply ``template`` to the quotations of ``self`` as the template
+        onchange does in the form. The lines are built once per language and
+        pricelist of the orders, and written with grouped writes."""
+        orders = self.filtered(lambda order: order.state in ('draft', 'sent'))
+        if not orders:
+            return orders
+        old_lines = orders.order_line
+        for (lang, pricelist), group in groupby(orders, lambda order: (order.partner_id.lang, order.pricelist_id)):
+            group = self.concat(*group)
+            group_template = template.with_context(lang=lang)
+            group.write({
+                'order_line': group[:1]._get_template_line_commands(group_template),
+                'sale_order_option_ids': group[:1]._get_template_option_commands(group_template),
+            })
+        (orders.order_line - old_lines)._compute_tax_id()
+        orders.write(template._get_sale_order_values(with_header=True))
+        return orders
+
+    def _get_template_line_prices(self, template_lines):
+        """Return the unit price and discount of the product of each template
+        line for this order, as a dict keyed by line id. The products are read
+        at once and priced with one pricelist evaluation per unit of
+        measure."""
+        template_lines = template_lines.filtered('product_id')
+        pricelist = self.pricelist_id
+        pricelist_prices = {}
+        if pricelist:
+            for uom, uom_lines in groupby(template_lines, lambda line: line.product_uom_id):
+                products = self.env['sale.order.template.line'].concat(*uom_lines).product_id
+                uom_prices = pricelist.with_context(uom=uom.id).get_products_price(
+                    products, [1] * len(products), [False] * len(products))
+                for line in uom_lines:
+                    pricelist_prices[line.id] = uom_prices[line.product_id.id]
+
+        result = {}
+        for line in template_lines:
+            price = line.product_id.lst_price
+            discount = 0
+            if pricelist:
+                pricelist_price = pricelist_prices[line.id]
+                if pricelist.discount_policy == 'without_discount' and price:
+                    discount = max(0, (price - pricelist_price) * 100 / price)
+                else:
+                    price = pricelist_price
+            result[line.id] = (price, discount)
+        return result
+
+    @api.onchange('sale_order_template_id')
+    def onchange_sale_order_template_id(self):
+        #res = super(SaleOrder, self).onchange_sale_order_template_id()
+
+        if not self.sale_order_template_id:
+            self.require_signature = self._get_default_require_signature()
+            self.require_payment = self._get_default_require_payment()
+            return
+
+        template = self.sale_order_template_id.with_context(lang=self.partner_id.lang)
+
+        # --- first, process the list of products from the template
+        order_lines = self._get_template_line_commands(template)
 
         self.order_line = order_lines
         self.order_line._compute_tax_id()
 
         # then, process the list of optional products from the template
-        option_lines = []
-        for option in template.sale_order_template_option_ids:
-            data = self._compute_option_data_for_template_change(option)
-            option_lines.append((0, 0, data))
-
-        self.sale_order_option_ids = option_lines
+        self.sale_order_option_ids = self._get_template_option_commands(template)
 
         if template.number_of_days > 0:
             self.validity_date = fields.Date.context_today(self) + timedelta(template.number_of_days)
@@ -441,95 +653,18 @@ class SaleOrder(models.Model):
         if not is_html_empty(template.note):
             self.note = template.note
 
-
-        if self.sale_order_template_id:
-            template = self.sale_order_template_id
-            if template.pricelist_id:
-                self.pricelist_id = template.pricelist_id.id
-            self.x_studio_lieferfrist = template.x_studio_lieferfrist
-            self.x_studio_preise_inkl_montage = template.x_studio_preise_inkl_montage
-            if template.x_studio_preise_inkl_montage:
-                self.preise_inkl_montage_text = template.preise_inkl_montage_text
-                self.preise_inkl_montage_label = template.preise_inkl_montage_label
-                self.preise_inkl_montage_sep = template.preise_inkl_montage_sep
-            self.termin = template.termin
-            if template.termin:
-                self.termin_text = template.termin_text
-                self.termin_label = template.termin_label
-                self.termin_sep = template.termin_sep
-            self.abholung = template.abholung
-            if template.abholung:
-                self.abholung_text = template.abholung_text
-                self.abholung_label = template.abholung_label
-                self.abholung_sep = template.abholung_sep
-            self.preise_sonderfarben = template.preise_sonderfarben
-            if template.preise_sonderfarben:
-                self.preise_sonderfarben_text = template.preise_sonderfarben_text
-                self.preise_sonderfarben_label = template.preise_sonderfarben_label
-                self.preise_sonderfarben_sep = template.preise_sonderfarben_sep
-            self.preise_exkl_montage = template.preise_exkl_montage
-            if template.preise_exkl_montage:
-                self.preise_exkl_montage_text = template.preise_exkl_montage_text
-                self.preise_exkl_montage_label = template.preise_exkl_montage_label
-                self.preise_exkl_montage_sep = template.preise_exkl_montage_sep
-            self.rabatt_5 = template.rabatt_5
-            if template.rabatt_5:
-                self.rabatt_5_text = template.rabatt_5_text
-                self.rabatt_5_label = template.rabatt_5_label
-                self.rabatt_5_sep = template.rabatt_5_sep
-            self.rabatt_10 = template.rabatt_10
-            if template.rabatt_10:
-                self.rabatt_10_text = template.rabatt_10_text
-                self.rabatt_10_label = template.rabatt_10_label
-                self.rabatt_10_sep = template.rabatt_10_sep
-            self.rabatt_40 = template.rabatt_40
-            if template.rabatt_40:
-                self.rabatt_40_text = template.rabatt_40_text
-                self.rabatt_40_label = template.rabatt_40_label
-                self.rabatt_40_sep = template.rabatt_40_sep
-            self.rabatt_u = template.rabatt_u
-            if template.rabatt_u:
-                self.rabatt_u_text = template.rabatt_u_text
-                self.rabatt_u_label = template.rabatt_u_label
-                self.rabatt_u_sep = template.rabatt_u_sep
-            self.rabattreduktion = template.rabattreduktion
-            if template.rabattreduktion:
-                self.rabattreduktion_text = template.rabattreduktion_text
-                self.rabattreduktion_label = template.rabattreduktion_label
-                self.rabattreduktion_sep = template.rabattreduktion_sep
-            self.garantie = template.garantie
-            if template.garantie:
-                self.garantie_text = template.garantie_text
-                self.garantie_label = template.garantie_label
-                self.garantie_sep = template.garantie_sep
-            self.garantie_wiederverkaufer = template.garantie_wiederverkaufer
-            if template.garantie_wiederverkaufer:
-                self.garantie_wiederverkaufer_text = template.garantie_wiederverkaufer_text
-                self.garantie_wiederverkaufer_label = template.garantie_wiederverkaufer_label
-                self.garantie_wiederverkaufer_sep = template.garantie_wiederverkaufer_sep
-            self.freier_text_block_id = template.freier_text_block_id
-            self.freier_text = template.freier_text
-            self.x_studio_ausmessen_liefern_und_montieren = template.ausmessen_liefern_und_montieren
-            self.x_studio_reparieren_ersetzen_von = template.reparieren_ersetzen_von
+        self.update(self.sale_order_template_id._get_sale_order_values())
         #return res
 
-    def _create_invoices(self, grouped=False, final=False, date=None):
-        res = super(SaleOrder, self)._create_invoices(grouped=grouped, final=final, date=date)
-        res.x_studio_ausmessen_liefern_und_montieren = self.x_studio_ausmessen_liefern_und_montieren if self.x_studio_ausmessen_liefern_und_montieren else None
-        res.ausmessen_liefern_und_montieren_text = self.ausmessen_liefern_und_montieren_text if self.ausmessen_liefern_und_montieren_text else None
-        res.x_studio_reparieren_ersetzen_von = self.x_studio_reparieren_ersetzen_von if self.x_studio_reparieren_ersetzen_von else None
-        res.reparieren_ersetzen_von_text = self.reparieren_ersetzen_von_text if self.reparieren_ersetzen_von_text else None
-        res.garantie = self.garantie if self.garantie else None
-        res.garantie_sep = self.garantie_sep if self.garantie_sep else None
-        res.garantie_label = self.garantie_label if self.garantie_label else None
-        res.garantie_text = self.garantie_text if self.garantie_text else None
-        res.garantie_wiederverkaufer = self.garantie_wiederverkaufer if self.garantie_wiederverkaufer else None
-        res.garantie_wiederverkaufer_sep = self.garantie_wiederverkaufer_sep if self.garantie_wiederverkaufer_sep else None
-        res.garantie_wiederverkaufer_label = self.garantie_wiederverkaufer_label if self.garantie_wiederverkaufer_label else None
-        res.garantie_wiederverkaufer_text = self.garantie_wiederverkaufer_text if self.garantie_wiederverkaufer_text else None
-        res.freier_text_block_id = self.freier_text_block_id if self.freier_text_block_id else None
-        res.freier_text = self.freier_text if self.freier_text else None
-        return res
+    def _prepare_invoice(self):
+        """Give the invoice the conditions and free text of its order in its
+        creation values, so that invoicing many orders at once creates each
+        invoice with the values of its own order and without further
+        writes."""
+        invoice_vals = super(SaleOrder, self)._prepare_invoice()
+        for fname in INVOICE_FIELDS:
+            invoice_vals[fname] = self._fields[fname].convert_to_write(self[fname], self) or False
+        return invoice_vals
 
 
 class SaleOrderLine(models.Model):
@@ -547,28 +682,37 @@ class SaleOrderLine(models.Model):
 
 
 class AccountMove(models.Model):
-    _inherit = "account.move"
-
-    garantie = fields.Boolean(string="Show Garantie")
-    garantie_sep = fields.Char(default="Garantie")
-    garantie_label = fields.Char(default="Garantie:")
-    garantie_text = fields.Text(string="Garantie Text", default="3 Jahre Garantie auf Material (exkl. auf Gewebe)")
-    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_sep = fields.Char(default="Garantie Wiederverkäufer")
-    garantie_wiederverkaufer_label = fields.Char(default="Garantie:")
-    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", default="3 Jahre Garantie auf Produkte (exkl. auf Gewebe) Schäden durch unsachgemässe Montage sind nicht garantieberechtigt")
+    _name = "account.move"
+    _inherit = ["account.move", "sale.condition.mixin", "text.body.mixin"]
+
+    condition_line_ids = fields.One2many('sale.condition.line', 'move_id', string="Condition Blocks", copy=True)
+    garantie = fields.Boolean(string="Show Garantie", compute='_compute_conditions', readonly=False)
+    garantie_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_text = fields.Text(string="Garantie Text", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer = fields.Boolean(string="Show Garantie Wiederverkäufer", compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_sep = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_label = fields.Char(compute='_compute_conditions', readonly=False)
+    garantie_wiederverkaufer_text = fields.Text(string="Garantie Wiederverkäufer Text", compute='_compute_conditions', readonly=False)
     x_studio_ausmessen_liefern_und_montieren = fields.Boolean(string="Ausmessen, liefern und montieren")
     ausmessen_liefern_und_montieren_text = fields.Char(string="Ausmessen, liefern und montieren", default="Ausmessen, liefern und montieren")
     x_studio_reparieren_ersetzen_von = fields.Boolean(string="Reparieren / Ersetzen von")
     reparieren_ersetzen_von_text = fields.Char(string="Reparieren / Ersetzen von", default="Reparieren / Ersetzen von")
     freier_text_block_id = fields.Many2one('text.blocks', 'Freier Text Block')
-    freier_text = fields.Html('Freier Text')
 
-    payment_communication = fields.Boolean(string="Show Payment Communication")
-    payment_communication_sep = fields.Char(string="Payment Communication", default="Payment Communication")
-    payment_communication_text = fields.Text(string="Show Payment Communication Text", default="Bitte benutzen Sie den beigefügten QR-Einzahlungsschein für Ihre Zahlung:")
+    payment_communication = fields.Boolean(string="Show Payment Communication", compute='_compute_conditions', readonly=False)
+    payment_communication_sep = fields.Char(string="Payment Communication", compute='_compute_conditions', readonly=False)
+    payment_communication_text = fields.Text(string="Show Payment Communication Text", compute='_compute_conditions', readonly=False)
 
     @api.onchange('freier_text_block_id')
     def onchange_freier_text_block_id(self):
         if self.freier_text_block_id:
             self.freier_text = self.freier_text_block_id.text_block
+
+    def _get_confirmed_records(self):
+        return self.filtered(lambda move: move.state == 'posted')
+
+    def _post(self, soft=True):
+        posted = super(AccountMove, self)._post(soft)
+        posted._freeze_conditions()
+        return posted
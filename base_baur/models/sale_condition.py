@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields, models, api
+
+# fields showing each condition block on the documents: the checkbox, then
+# the separator, the label and the text printed on the report
+CONDITION_ATTRS = ('show', 'sep', 'label', 'text')
+# attributes of a condition block a document can change, each one with a
+# "<attr>_custom" flag on the condition line
+CONDITION_TEXT_ATTRS = ('sep', 'label', 'text')
+CONDITION_FIELDS = {
+    'termin': ('termin', 'termin_sep', 'termin_label', 'termin_text'),
+    'abholung': ('abholung', 'abholung_sep', 'abholung_label', 'abholung_text'),
+    'preise_sonderfarben': ('preise_sonderfarben', 'preise_sonderfarben_sep', 'preise_sonderfarben_label', 'preise_sonderfarben_text'),
+    'preise_inkl_montage': ('x_studio_preise_inkl_montage', 'preise_inkl_montage_sep', 'preise_inkl_montage_label', 'preise_inkl_montage_text'),
+    'preise_exkl_montage': ('preise_exkl_montage', 'preise_exkl_montage_sep', 'preise_exkl_montage_label', 'preise_exkl_montage_text'),
+    'rabatt_5': ('rabatt_5', 'rabatt_5_sep', 'rabatt_5_label', 'rabatt_5_text'),
+    'rabatt_10': ('rabatt_10', 'rabatt_10_sep', 'rabatt_10_label', 'rabatt_10_text'),
+    'rabatt_40': ('rabatt_40', 'rabatt_40_sep', 'rabatt_40_label', 'rabatt_40_text'),
+    'rabatt_u': ('rabatt_u', 'rabatt_u_sep', 'rabatt_u_label', 'rabatt_u_text'),
+    'rabattreduktion': ('rabattreduktion', 'rabattreduktion_sep', 'rabattreduktion_label', 'rabattreduktion_text'),
+    'garantie': ('garantie', 'garantie_sep', 'garantie_label', 'garantie_text'),
+    'garantie_wiederverkaufer': ('garantie_wiederverkaufer', 'garantie_wiederverkaufer_sep', 'garantie_wiederverkaufer_label', 'garantie_wiederverkaufer_text'),
+    'payment_communication': ('payment_communication', 'payment_communication_sep', None, 'payment_communication_text'),
+}
+
+
+class SaleCondition(models.Model):
+    _name = "sale.condition"
+    _description = "Condition Block"
+    _order = "sequence, id"
+
+    code = fields.Char(required=True, readonly=True)
+    sequence = fields.Integer(default=10)
+    sep = fields.Char(string="Name", required=True)
+    label = fields.Char(string="Report Label")
+    text = fields.Text(string="Report Text")
+
+    _sql_constraints = [
+        ('code_uniq', 'unique(code)', "A condition block already exists with this code."),
+    ]
+
+    def name_get(self):
+        return [(condition.id, condition.sep) for condition in self]
+
+    @api.model
+    def _get_by_code(self):
+        return {condition.code: condition for condition in self.search([])}
+
+
+class SaleConditionLine(models.Model):
+    _name = "sale.condition.line"
+    _description = "Condition Block of a Document"
+    _order = "condition_id"
+
+    condition_id = fields.Many2one('sale.condition', required=True, ondelete='cascade')
+    template_id = fields.Many2one('sale.order.template', ondelete='cascade', index=True)
+    order_id = fields.Many2one('sale.order', ondelete='cascade', index=True)
+    move_id = fields.Many2one('account.move', ondelete='cascade', index=True)
+    # the separator, label and text are only stored when they differ from the
+    # ones of the condition block, which are shared by all the documents: the
+    # "custom" flags tell the values of the document, possibly empty, from
+    # the ones to take from the condition block
+    show = fields.Boolean()
+    sep = fields.Char()
+    label = fields.Char()
+    text = fields.Text()
+    sep_custom = fields.Boolean()
+    label_custom = fields.Boolean()
+    text_custom = fields.Boolean()
+
+    @api.model
+    def _get_condition_line_fields(self):
+        return list(CONDITION_ATTRS) + [attr + '_custom' for attr in CONDITION_TEXT_ATTRS]
+
+
+class SaleConditionMixin(models.AbstractModel):
+    """Documents showing condition blocks. The condition fields listed in
+    ``CONDITION_FIELDS`` are computed from the ``condition_line_ids`` of the
+    document, which only has a line for the blocks it shows or whose texts
+    were changed. Confirmed documents keep the texts they were confirmed
+    with, see ``_freeze_conditions``."""
+    _name = "sale.condition.mixin"
+    _description = "Document with Condition Blocks"
+
+    def _get_condition_fields(self):
+        """Return a dict mapping each condition field of the model to its
+        condition code and attribute (see ``CONDITION_ATTRS``)."""
+        return {
+            fname: (code, attr)
+            for code, fnames in CONDITION_FIELDS.items()
+            for attr, fname in zip(CONDITION_ATTRS, fnames)
+            if fname and fname in self._fields
+        }
+
+    @api.depends('condition_line_ids.show', 'condition_line_ids.sep', 'condition_line_ids.label', 'condition_line_ids.text',
+                 'condition_line_ids.sep_custom', 'condition_line_ids.label_custom', 'condition_line_ids.text_custom',
+                 'condition_line_ids.condition_id', 'condition_line_ids.condition_id.sep',
+                 'condition_line_ids.condition_id.label', 'condition_line_ids.condition_id.text')
+    def _compute_conditions(self):
+        conditions = self.env['sale.condition']._get_by_code()
+        condition_fields = self._get_condition_fields()
+        for record in self:
+            lines = {line.condition_id.code: line for line in record.condition_line_ids}
+            values = {}
+            for fname, (code, attr) in condition_fields.items():
+                line = lines.get(code)
+                if attr == 'show':
+                    values[fname] = bool(line and line.show)
+                elif line and line[attr + '_custom']:
+                    values[fname] = line[attr]
+                else:
+                    values[fname] = conditions.get(code, self.env['sale.condition'])[attr]
+            record.update(values)
+
+    def _write_conditions(self, values_list):
+        """Store the condition field values given for each record of ``self``
+        in ``values_list`` on the condition lines. The lines getting the same
+        changes are updated together."""
+        conditions = self.env['sale.condition']._get_by_code()
+        condition_fields = self._get_condition_fields()
+        inverse_name = self._fields['condition_line_ids'].inverse_name
+        Line = self.env['sale.condition.line']
+        to_create, to_write, to_unlink = [], {}, Line
+        for record, values in zip(self, values_list):
+            if not values:
+                continue
+            changes = {}
+            for fname, value in values.items():
+                code, attr = condition_fields[fname]
+                changes.setdefault(code, {})[attr] = value
+            lines = {line.condition_id.code: line for line in record.condition_line_ids}
+            for code, attrs in changes.items():
+                condition = conditions.get(code)
+                if not condition:
+                    continue
+                line = lines.get(code, Line)
+                line_vals = {fname: line[fname] for fname in Line._get_condition_line_fields()}
+                for attr, value in attrs.items():
+                    if attr == 'show':
+                        line_vals[attr] = bool(value)
+                    else:
+                        # an empty value is kept as such when the default is not
+                        custom = (value or False) != (condition[attr] or False)
+                        line_vals[attr] = (value or False) if custom else False
+                        line_vals[attr + '_custom'] = custom
+                if not any(line_vals.values()):
+                    to_unlink |= line
+                elif line:
+                    diff = frozenset((attr, value) for attr, value in line_vals.items() if line[attr] != value)
+                    if diff:
+                        to_write[diff] = to_write.get(diff, Line) | line
+                else:
+                    to_create.append(dict(line_vals, condition_id=condition.id, **{inverse_name: record.id}))
+        to_unlink.unlink()
+        for diff, lines in to_write.items():
+            lines.write(dict(diff))
+        Line.create(to_create)
+
+    def _get_confirmed_records(self):
+        """Return the records of ``self`` whose condition texts must no longer
+        follow the defaults, e.g. confirmed orders or posted invoices."""
+        return self.browse()
+
+    def _freeze_conditions(self):
+        """Copy the default texts of the condition blocks shown on the
+        documents to their condition lines, so that changing a default later
+        on does not change the documents already confirmed or posted. The
+        lines getting the same texts are updated together."""
+        to_write = {}
+        for line in self.condition_line_ids:
+            if not line.show:
+                continue
+            diff = frozenset(
+                item
+                for attr in CONDITION_TEXT_ATTRS if not line[attr + '_custom']
+                for item in ((attr, line.condition_id[attr]), (attr + '_custom', True))
+            )
+            if diff:
+                to_write[diff] = to_write.get(diff, self.env['sale.condition.line']) | line
+        for diff, lines in to_write.items():
+            lines.write(dict(diff))
+
+    def _pop_condition_values(self, vals):
+        condition_fields = self._get_condition_fields()
+        return {fname: vals.pop(fname) for fname in list(vals) if fname in condition_fields}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        vals_list = [dict(vals) for vals in vals_list]
+        conditions_list = [self._pop_condition_values(vals) for vals in vals_list]
+        records = super(SaleConditionMixin, self).create(vals_list)
+        records._write_conditions(conditions_list)
+        return records
+
+    def write(self, vals):
+        vals = dict(vals)
+        conditions = self._pop_condition_values(vals)
+        res = super(SaleConditionMixin, self).write(vals)
+        if conditions:
+            self._write_conditions([conditions] * len(self))
+            self._get_confirmed_records()._freeze_conditions()
+        return res
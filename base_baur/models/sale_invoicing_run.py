@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+import logging
+import threading
+
+from odoo import fields, models, api
+from odoo.tools.safe_eval import safe_eval
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleInvoicingRun(models.Model):
+    _name = "sale.invoicing.run"
+    _description = "Background Invoicing of Sales Orders"
+    _order = "id desc"
+
+    name = fields.Char(required=True, default="Invoicing", states={'running': [('readonly', True)], 'done': [('readonly', True)]})
+    domain = fields.Char(string="Orders", default="[]", required=True, states={'running': [('readonly', True)], 'done': [('readonly', True)]})
+    grouped = fields.Boolean(string="One Invoice per Order", states={'running': [('readonly', True)], 'done': [('readonly', True)]})
+    final = fields.Boolean(string="Deduct Down Payments", default=True, states={'running': [('readonly', True)], 'done': [('readonly', True)]})
+    batch_size = fields.Integer(default=100, required=True, states={'running': [('readonly', True)], 'done': [('readonly', True)]})
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], default='draft', required=True, readonly=True, copy=False)
+    # orders are processed by increasing id, the last one processed is kept
+    # so that an interrupted run resumes after it
+    last_order_id = fields.Integer(readonly=True, copy=False)
+    order_count = fields.Integer(string="Orders to Invoice", readonly=True, copy=False)
+    done_count = fields.Integer(string="Orders Processed", readonly=True, copy=False)
+    progress = fields.Float(compute='_compute_progress')
+    move_ids = fields.Many2many('account.move', string="Invoices", readonly=True, copy=False)
+    invoice_count = fields.Integer(compute='_compute_progress')
+    failed_order_ids = fields.Many2many('sale.order', string="Failed Orders", readonly=True, copy=False)
+    message = fields.Text(readonly=True, copy=False)
+
+    @api.depends('order_count', 'done_count', 'move_ids')
+    def _compute_progress(self):
+        for run in self:
+            run.progress = 100.0 * run.done_count / run.order_count if run.order_count else 0.0
+            run.invoice_count = len(run.move_ids)
+
+    def _get_order_domain(self):
+        """Orders of the run still to invoice: once invoiced, an order no
+        longer matches, so that a batch done twice creates no duplicate."""
+        self.ensure_one()
+        return safe_eval(self.domain) + [('invoice_status', '=', 'to invoice')]
+
+    def action_start(self):
+        for run in self:
+            run.write({
+                'state': 'running',
+                'last_order_id': 0,
+                'done_count': 0,
+                'order_count': self.env['sale.order'].search_count(run._get_order_domain()),
+                'message': False,
+            })
+        self.env.ref('base_baur.ir_cron_sale_invoicing_run')._trigger()
+
+    def action_view_invoices(self):
+        self.ensure_one()
+        action = self.env['ir.actions.actions']._for_xml_id('account.action_move_out_invoice_type')
+        action['domain'] = [('id', 'in', self.move_ids.ids)]
+        return action
+
+    def _process_batch(self):
+        """Invoice the next batch of orders of the run. Should the batch
+        fail, its orders are invoiced one by one so that only the faulty ones
+        are skipped.
+
+        :return: whether there are orders left
+        """
+        self.ensure_one()
+        orders = self.env['sale.order'].search(self._get_order_domain() + [('id', '>', self.last_order_id)], order='id', limit=self.batch_size)
+        if not orders:
+            self.write({'state': 'done'})
+            return False
+        moves = self.env['account.move']
+        failed = self.env['sale.order']
+        errors = []
+        try:
+            with self.env.cr.savepoint():
+                moves = orders._create_invoices(grouped=self.grouped, final=self.final)
+        except Exception:
+            for order in orders:
+                try:
+                    with self.env.cr.savepoint():
+                        moves |= order._create_invoices(grouped=self.grouped, final=self.final)
+                except Exception as e:
+                    failed |= order
+                    errors.append("%s: %s" % (order.name, e))
+        self.write({
+            'last_order_id': orders[-1].id,
+            'done_count': self.done_count + len(orders),
+            'move_ids': [(4, move.id) for move in moves],
+            'failed_order_ids': [(4, order.id) for order in failed],
+            'message': '\n'.join(filter(None, [self.message] + errors)) or False,
+        })
+        return True
+
+    @api.model
+    def _cron_process_runs(self):
+        """Process the running invoicing runs, committing after each batch:
+        after a crash, the next call resumes after the last committed batch."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for run in self.search([('state', '=', 'running')], order='id'):
+            while run._process_batch():
+                _logger.info("Invoicing run %s: %d/%d orders processed", run.name, run.done_count, run.order_count)
+                self.env['base'].flush()
+                if auto_commit:
+                    self.env.cr.commit()
+                self.env['base'].invalidate_cache()
+            if auto_commit:
+                self.env.cr.commit()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+import logging
+import threading
+
+from odoo import fields, models, api
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleOrderTemplateApplyRun(models.Model):
+    _name = "sale.order.template.apply.run"
+    _description = "Background Application of a Quotation Template"
+    _order = "id desc"
+
+    sale_order_template_id = fields.Many2one('sale.order.template', string="Quotation Template", required=True, readonly=True)
+    batch_size = fields.Integer(default=200, required=True, readonly=True)
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], default='running', required=True, readonly=True, copy=False)
+    # an order moves from order_ids to done_order_ids in the transaction
+    # applying the template to it: a batch interrupted before its commit is
+    # done again, a committed one never is
+    order_ids = fields.Many2many('sale.order', 'sale_order_template_apply_run_order_rel', string="Quotations to Process", readonly=True, copy=False)
+    done_order_ids = fields.Many2many('sale.order', 'sale_order_template_apply_run_done_rel', string="Quotations Processed", readonly=True, copy=False)
+    failed_order_ids = fields.Many2many('sale.order', 'sale_order_template_apply_run_failed_rel', string="Failed Quotations", readonly=True, copy=False)
+    order_count = fields.Integer(string="Quotations", readonly=True, copy=False)
+    done_count = fields.Integer(string="Quotations Processed", compute='_compute_progress')
+    progress = fields.Float(compute='_compute_progress')
+    message = fields.Text(readonly=True, copy=False)
+
+    @api.depends('order_count', 'done_order_ids', 'failed_order_ids')
+    def _compute_progress(self):
+        for run in self:
+            run.done_count = len(run.done_order_ids) + len(run.failed_order_ids)
+            run.progress = 100.0 * run.done_count / run.order_count if run.order_count else 0.0
+
+    def name_get(self):
+        return [(run.id, "%s (%s)" % (run.sale_order_template_id.name, run.create_date)) for run in self]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        runs = super(SaleOrderTemplateApplyRun, self).create(vals_list)
+        for run in runs:
+            run.order_count = len(run.order_ids)
+        self.env.ref('base_baur.ir_cron_sale_order_template_apply_run')._trigger()
+        return runs
+
+    def _process_batch(self):
+        """Apply the template to the next batch of quotations of the run.
+        Should the batch fail, its quotations are processed one by one so
+        that only the faulty ones are skipped.
+
+        :return: whether there are quotations left
+        """
+        self.ensure_one()
+        orders = self.order_ids.sorted('id')[:self.batch_size]
+        if not orders:
+            self.write({'state': 'done'})
+            return False
+        template = self.sale_order_template_id
+        failed = self.env['sale.order']
+        errors = []
+        try:
+            with self.env.cr.savepoint():
+                orders._apply_sale_order_template(template)
+        except Exception:
+            for order in orders:
+                try:
+                    with self.env.cr.savepoint():
+                        order._apply_sale_order_template(template)
+                except Exception as e:
+                    failed |= order
+                    errors.append("%s: %s" % (order.name, e))
+        self.write({
+            'order_ids': [(3, order.id) for order in orders],
+            'done_order_ids': [(4, order.id) for order in orders - failed],
+            'failed_order_ids': [(4, order.id) for order in failed],
+            'message': '\n'.join(filter(None, [self.message] + errors)) or False,
+        })
+        return True
+
+    @api.model
+    def _cron_process_runs(self):
+        """Process the running runs, committing after each batch: after a
+        crash, the next call resumes with the quotations not processed yet."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        for run in self.search([('state', '=', 'running')], order='id'):
+            while run._process_batch():
+                _logger.info("Quotation template run %s: %d/%d quotations processed", run.display_name, run.done_count, run.order_count)
+                self.env['base'].flush()
+                if auto_commit:
+                    self.env.cr.commit()
+                self.env['base'].invalidate_cache()
+            if auto_commit:
+                self.env.cr.commit()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+import hashlib
+
+from odoo import fields, models, api, tools, _
+from odoo.exceptions import UserError
+
+
+# options of the sanitization of the fields.Html fields the free texts were
+# stored in before, so that a body is as clean as these used to be
+SANITIZE_OPTIONS = {
+    'silent': True,
+    'sanitize_tags': True,
+    'sanitize_attributes': True,
+    'sanitize_style': False,
+    'sanitize_form': True,
+    'strip_style': False,
+    'strip_classes': False,
+}
+
+
+def html_checksum(html):
+    return hashlib.sha256(html.encode()).hexdigest()
+
+
+class TextBody(models.Model):
+    """Free text shared by all the documents having the very same one. A body
+    is never changed: editing the text of a document makes it reference
+    another body, found or created from the checksum of the new text."""
+    _name = "text.body"
+    _description = "Free Text Body"
+    _rec_name = "checksum"
+
+    checksum = fields.Char(required=True, readonly=True, index=True)
+    body = fields.Html(readonly=True, sanitize=False)
+
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(checksum)', "A text body already exists with this content."),
+    ]
+
+    def write(self, vals):
+        if {'checksum', 'body'} & set(vals):
+            raise UserError(_("A free text body cannot be changed, change the text of the document instead."))
+        return super(TextBody, self).write(vals)
+
+    @api.model
+    def _search_locked(self, checksums):
+        """Return the bodies with the given checksums, locked until the end
+        of the transaction so that ``_gc_unused_bodies`` leaves them alone
+        while the documents about to reference them are saved."""
+        if not checksums:
+            return self.browse()
+        self.flush(['checksum'])
+        self.env.cr.execute("SELECT id FROM text_body WHERE checksum IN %s FOR KEY SHARE", [tuple(checksums)])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _get_bodies(self, htmls):
+        """Return a dict mapping each given HTML text to its body.
+
+        The checksum is the one of the sanitized text. The texts are first
+        looked up as they are, which finds the ones already clean (e.g. read
+        back from a body, or copied from a text block) without sanitizing
+        them again; only the others are sanitized, then looked up or created.
+        """
+        self = self.sudo()
+        htmls = {html for html in htmls if html}
+        result = {}
+        for body in self._search_locked([html_checksum(html) for html in htmls]):
+            result[body.body] = body
+        sanitized = {html: tools.html_sanitize(html, **SANITIZE_OPTIONS) for html in htmls if html not in result}
+        if sanitized:
+            checksums = {html_checksum(body): body for body in set(sanitized.values())}
+            bodies = {body.checksum: body for body in self._search_locked(list(checksums))}
+            missing = [checksum for checksum in checksums if checksum not in bodies]
+            created = self.create([{'checksum': checksum, 'body': checksums[checksum]} for checksum in missing])
+            bodies.update(zip(missing, created))
+            for html, body in sanitized.items():
+                result[html] = bodies[html_checksum(body)]
+        return result
+
+    @api.autovacuum
+    def _gc_unused_bodies(self):
+        """Delete the bodies no document references anymore. The bodies
+        locked by a transaction about to reference them are skipped (see
+        ``_search_locked``)."""
+        references = self.env['ir.model.fields'].sudo().search([
+            ('relation', '=', self._name), ('ttype', '=', 'many2one'), ('store', '=', True),
+        ])
+        conditions = []
+        for field in references:
+            model = self.env.get(field.model)
+            if model is None or model._abstract or not model._auto:
+                continue
+            conditions.append('NOT EXISTS (SELECT 1 FROM "%s" WHERE "%s" = b.id)' % (model._table, field.name))
+        if not conditions:
+            return
+        self.env['base'].flush()
+        self.env.cr.execute("SELECT b.id FROM text_body b WHERE %s FOR UPDATE SKIP LOCKED" % " AND ".join(conditions))
+        self.browse([row[0] for row in self.env.cr.fetchall()]).unlink()
+
+
+class TextBodyMixin(models.AbstractModel):
+    """Documents with a free text stored as a shared ``text.body``."""
+    _name = "text.body.mixin"
+    _description = "Document with a Shared Free Text"
+
+    freier_text_body_id = fields.Many2one('text.body', string="Freier Text Body", index=True, readonly=True, ondelete='restrict')
+    freier_text = fields.Html('Freier Text', compute='_compute_freier_text', readonly=False, sanitize=False)
+
+    @api.depends('freier_text_body_id')
+    def _compute_freier_text(self):
+        for record in self:
+            record.freier_text = record.freier_text_body_id.sudo().body
+
+    def _set_freier_text_body(self, vals_list):
+        """Replace the free texts in ``vals_list`` by their bodies."""
+        htmls = [vals['freier_text'] for vals in vals_list if 'freier_text' in vals]
+        if not htmls:
+            return
+        bodies = self.env['text.body']._get_bodies(htmls)
+        for vals in vals_list:
+            if 'freier_text' in vals:
+                vals['freier_text_body_id'] = bodies.get(vals.pop('freier_text'), self.env['text.body']).id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        vals_list = [dict(vals) for vals in vals_list]
+        self._set_freier_text_body(vals_list)
+        return super(TextBodyMixin, self).create(vals_list)
+
+    def write(self, vals):
+        vals = dict(vals)
+        self._set_freier_text_body([vals])
+        return super(TextBodyMixin, self).write(vals)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from . import test_account_move_installment
+from . import test_payment_term
+from . import test_sale_condition
+from . import test_sale_invoicing_run
+from . import test_sale_order_template_apply
+from . import test_text_body
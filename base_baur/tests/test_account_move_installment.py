@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import Form, tagged
+
+from .test_sale_condition import load_migration
+
+
+@tagged('post_install', '-at_install')
+class TestAccountMoveInstallment(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.payment_term = cls._create_payment_term(2.0)
+
+    @classmethod
+    def _create_payment_term(cls, discount_percentage):
+        return cls.env['account.payment.term'].create({
+            'name': "30%% sofort (%s%% Skonto), Rest 30 Tage" % discount_percentage,
+            'line_ids': [
+                (0, 0, {'value': 'percent', 'value_amount': 30.0, 'days': 0,
+                        'discount_percentage': discount_percentage, 'discount_days': 10}),
+                (0, 0, {'value': 'balance', 'days': 30}),
+            ],
+        })
+
+    def _create_invoice(self):
+        with Form(self.env['account.move'].with_context(default_move_type='out_invoice')) as move_form:
+            move_form.partner_id = self.partner_a
+            move_form.invoice_date = fields.Date.from_string('2022-01-15')
+            move_form.invoice_payment_term_id = self.payment_term
+            with move_form.invoice_line_ids.new() as line_form:
+                line_form.product_id = self.product_a
+        return move_form.save()
+
+    def _installments(self, invoice):
+        return [
+            (installment.date, installment.amount_currency, installment.discount_percentage, installment.discount_date)
+            for installment in invoice.installment_ids.sorted('sequence')
+        ]
+
+    def _expected_installments(self, invoice, discount_percentage):
+        lines = invoice.line_ids.filtered(lambda line: line.account_id.user_type_id.type == 'receivable')
+        first, last = lines.sorted('date_maturity')
+        return [
+            (first.date_maturity, first.amount_currency, discount_percentage, fields.Date.from_string('2022-01-25')),
+            (last.date_maturity, last.amount_currency, 0.0, False),
+        ]
+
+    def test_post_draft_cancel(self):
+        invoice = self._create_invoice()
+        self.assertFalse(invoice.installment_ids)
+
+        invoice.action_post()
+        self.assertEqual(self._installments(invoice), self._expected_installments(invoice, 2.0))
+        self.assertEqual(
+            [installment.date for installment in invoice.installment_ids.sorted('sequence')],
+            [fields.Date.from_string('2022-01-15'), fields.Date.from_string('2022-02-14')])
+
+        invoice.button_draft()
+        self.assertFalse(invoice.installment_ids)
+
+        invoice.action_post()
+        self.assertEqual(len(invoice.installment_ids), 2)
+        invoice.button_draft()
+        invoice.button_cancel()
+        self.assertFalse(invoice.installment_ids)
+
+    def test_write_rebuild(self):
+        invoice = self._create_invoice()
+        invoice.action_post()
+        installments = invoice.installment_ids
+
+        # same due dates, other discount: the discount of the installment follows
+        invoice.invoice_payment_term_id = self._create_payment_term(3.0)
+        self.assertFalse(installments.exists())
+        self.assertEqual(self._installments(invoice), self._expected_installments(invoice, 3.0))
+
+        installments = invoice.installment_ids
+        invoice.invoice_date_due = fields.Date.from_string('2022-03-01')
+        self.assertFalse(installments.exists())
+        self.assertEqual(self._installments(invoice), self._expected_installments(invoice, 3.0))
+
+        # other fields leave the installments alone
+        installments = invoice.installment_ids
+        invoice.ref = "Bestellung 42"
+        self.assertTrue(installments.exists())
+
+    def test_migration(self):
+        invoice = self._create_invoice()
+        invoice.action_post()
+        draft = self._create_invoice()
+        expected = self._installments(invoice)
+        invoice.installment_ids.sudo().unlink()
+
+        load_migration('1.1').migrate(self.env.cr, '1.0')
+        self.env['account.move'].invalidate_cache()
+        self.assertEqual(self._installments(invoice), expected)
+        self.assertFalse(draft.installment_ids)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import Form, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestPaymentTerm(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.payment_term = cls.env['account.payment.term'].create({
+            'name': "30% sofort, Rest 30 Tage",
+            'line_ids': [
+                (0, 0, {'value': 'percent', 'value_amount': 30.0, 'days': 0,
+                        'discount_percentage': 2.0, 'discount_days': 10}),
+                (0, 0, {'value': 'balance', 'days': 30}),
+            ],
+        })
+
+    def _count_preview_computations(self):
+        PaymentTerm = type(self.env['account.payment.term'])
+        with patch.object(PaymentTerm, '_compute_terms', autospec=True, side_effect=PaymentTerm._compute_terms) as compute_terms:
+            self.payment_term.invalidate_cache(['example_preview'])
+            self.assertTrue(self.payment_term.example_preview)
+        return compute_terms.call_count
+
+    def test_example_preview_cache(self):
+        self.env['account.payment.term'].clear_caches()
+        self.assertEqual(self._count_preview_computations(), 1)
+        # same lines and same settings: the preview is reused
+        self.assertEqual(self._count_preview_computations(), 0)
+
+        self.payment_term.line_ids.filtered(lambda line: line.value == 'percent').days = 5
+        self.assertEqual(self._count_preview_computations(), 1)
+        self.assertEqual(self._count_preview_computations(), 0)
+
+        self.env.company.early_pay_discount_computation = 'excluded'
+        self.assertEqual(self._count_preview_computations(), 1)
+        self.assertEqual(self._count_preview_computations(), 0)
+
+    def test_compute_terms_batch(self):
+        company = self.env.company
+        currencies = company.currency_id | self.currency_data['currency']
+        payment_terms = self.payment_term | self.env['account.payment.term'].create({
+            'name': "Fest 100, Rest Ende Monat",
+            'line_ids': [
+                (0, 0, {'value': 'fixed', 'value_amount': 100.0, 'days': 10}),
+                (0, 0, {'value': 'balance', 'months': 1, 'end_month': True, 'days_after': 5,
+                        'discount_percentage': 3.0, 'discount_days': 7}),
+            ],
+        })
+        moves_values = [{
+            'date_ref': fields.Date.to_date(date_ref),
+            'currency': currency,
+            'tax_amount': sign * 77.0,
+            'tax_amount_currency': sign * 154.0,
+            'sign': sign,
+            'untaxed_amount': sign * 1000.33,
+            'untaxed_amount_currency': sign * 2000.66,
+        } for date_ref in ('2022-01-31', '2022-02-15', '2022-12-31')
+            for currency in currencies
+            for sign in (1, -1)]
+        for mode in ('included', 'excluded', 'mixed'):
+            company.early_pay_discount_computation = mode
+            for payment_term in payment_terms:
+                self.assertEqual(
+                    payment_term._compute_terms_batch(company, moves_values),
+                    [payment_term._compute_terms(company=company, **values) for values in moves_values])
+
+    def test_compute_posting(self):
+        self.payment_term.line_ids.filtered(lambda line: line.value == 'balance').write({
+            'option': 'after_invoice_month',
+            'days': 10,
+        })
+        self.assertEqual(self.payment_term.compute(1000.0, date_ref='2022-01-15'), [
+            ('2022-01-15', 300.0),
+            ('2022-02-10', 700.0),
+        ])
+        with Form(self.env['account.move'].with_context(default_move_type='out_invoice')) as move_form:
+            move_form.partner_id = self.partner_a
+            move_form.invoice_date = fields.Date.from_string('2022-01-15')
+            move_form.invoice_payment_term_id = self.payment_term
+            with move_form.invoice_line_ids.new() as line_form:
+                line_form.product_id = self.product_a
+        invoice = move_form.save()
+        invoice.action_post()
+        lines = invoice.line_ids.filtered(lambda line: line.account_id.user_type_id.type == 'receivable')
+        schedule = self.payment_term.compute(invoice.amount_total, date_ref=invoice.invoice_date, currency=invoice.currency_id)
+        self.assertEqual(
+            sorted((fields.Date.to_string(line.date_maturity), line.amount_currency) for line in lines),
+            sorted(schedule))
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+import importlib.util
+import os
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+def load_migration(version):
+    path = os.path.join(os.path.dirname(__file__), os.pardir, 'migrations', version, 'post-migration.py')
+    spec = importlib.util.spec_from_file_location('base_baur_migration_%s' % version.replace('.', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@tagged('post_install', '-at_install')
+class TestSaleCondition(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.termin = cls.env.ref('base_baur.sale_condition_termin')
+        cls.payment_communication = cls.env.ref('base_baur.sale_condition_payment_communication')
+
+    def _create_order(self, **values):
+        return self.env['sale.order'].create(dict({
+            'partner_id': self.partner_a.id,
+            'order_line': [(0, 0, {'product_id': self.product_a.id, 'product_uom_qty': 1.0})],
+        }, **values))
+
+    def _line(self, record, condition):
+        return record.condition_line_ids.filtered(lambda line: line.condition_id == condition)
+
+    def test_round_trip(self):
+        order = self._create_order(termin=True, termin_text="Ende Mai")
+        line = self._line(order, self.termin)
+        self.assertEqual((line.show, line.text, line.text_custom), (True, "Ende Mai", True))
+        self.assertFalse(line.label_custom)
+        self.assertEqual(order.termin_text, "Ende Mai")
+        self.assertEqual(order.termin_label, self.termin.label)
+
+        # back to the default text: nothing stored but the checkbox
+        order.termin_text = self.termin.text
+        self.assertEqual((line.text, line.text_custom), (False, False))
+        self.assertEqual(order.termin_text, self.termin.text)
+
+        # hidden again with the default texts: no line left
+        order.termin = False
+        self.assertFalse(self._line(order, self.termin))
+        self.assertEqual(order.termin_text, self.termin.text)
+
+    def test_empty_text(self):
+        order = self._create_order(termin=True)
+        order.termin_text = False
+        line = self._line(order, self.termin)
+        self.assertTrue(line.text_custom)
+        self.assertFalse(order.termin_text)
+        self.termin.text = "neuer Text"
+        order.invalidate_cache()
+        self.assertFalse(order.termin_text)
+
+    def test_default_change(self):
+        draft = self._create_order(termin=True)
+        confirmed = self._create_order(termin=True)
+        confirmed.action_confirm()
+        old_text = self.termin.text
+        self.termin.text = "neuer Text"
+        (draft | confirmed).invalidate_cache()
+        self.assertEqual(draft.termin_text, "neuer Text")
+        self.assertEqual(confirmed.termin_text, old_text)
+
+        # blocks shown after the confirmation are frozen as well
+        confirmed.write({'abholung': True})
+        abholung = self.env.ref('base_baur.sale_condition_abholung')
+        old_text = abholung.text
+        abholung.text = "neuer Text"
+        confirmed.invalidate_cache()
+        self.assertEqual(confirmed.abholung_text, old_text)
+
+        # resetting the texts of a confirmed order takes the current default
+        confirmed.termin_text = "Ende Mai"
+        confirmed.action_condition_text_add()
+        self.assertEqual(confirmed.termin_text, "neuer Text")
+        self.assertTrue(self._line(confirmed, self.termin).text_custom)
+
+    def test_recompute(self):
+        # no cache invalidation: the dependencies alone update the fields
+        order = self._create_order(termin=True, termin_label="Liefertermin")
+        line = self._line(order, self.termin)
+        self.termin.text = "neuer Text"
+        self.assertEqual(order.termin_text, "neuer Text")
+        line.write({'text': "Ende Mai", 'text_custom': True})
+        self.assertEqual(order.termin_text, "Ende Mai")
+        line.text_custom = False
+        self.assertEqual(order.termin_text, "neuer Text")
+        self.assertEqual(order.termin_label, "Liefertermin")
+        abholung = self.env.ref('base_baur.sale_condition_abholung')
+        line.condition_id = abholung
+        self.assertEqual(order.termin_label, self.termin.label)
+        self.assertEqual(order.abholung_label, "Liefertermin")
+
+    def test_posted_invoice(self):
+        invoice = self.init_invoice('out_invoice', products=self.product_a)
+        invoice.payment_communication = True
+        invoice.action_post()
+        old_text = self.payment_communication.text
+        self.payment_communication.text = "neuer Text"
+        invoice.invalidate_cache()
+        self.assertEqual(invoice.payment_communication_text, old_text)
+
+    def test_migration(self):
+        draft = self._create_order()
+        emptied = self._create_order()
+        confirmed = self._create_order()
+        self.env['base'].flush()
+        cr = self.env.cr
+        cr.execute("ALTER TABLE sale_order ADD COLUMN termin boolean, ADD COLUMN termin_text text")
+        cr.execute("UPDATE sale_order SET termin = true, termin_text = %s WHERE id IN %s",
+                   (self.termin.text, (draft.id, confirmed.id)))
+        cr.execute("UPDATE sale_order SET termin = false, termin_text = NULL WHERE id = %s", (emptied.id,))
+        cr.execute("UPDATE sale_order SET state = 'sale' WHERE id = %s", (confirmed.id,))
+
+        load_migration('1.2').migrate(cr, '1.1')
+        self.env['base'].invalidate_cache()
+
+        cr.execute("SELECT 1 FROM information_schema.columns WHERE table_name = 'sale_order' AND column_name = 'termin_text'")
+        self.assertFalse(cr.fetchone())
+        line = self._line(draft, self.termin)
+        self.assertEqual((line.show, line.text_custom, line.text), (True, False, False))
+        self.assertEqual(draft.termin_text, self.termin.text)
+        line = self._line(emptied, self.termin)
+        self.assertEqual((line.show, line.text_custom, line.text), (False, True, False))
+        self.assertFalse(emptied.termin_text)
+        line = self._line(confirmed, self.termin)
+        self.assertTrue(line.sep_custom and line.label_custom and line.text_custom)
+        self.assertEqual((line.sep, line.label, line.text), (self.termin.sep, self.termin.label, self.termin.text))
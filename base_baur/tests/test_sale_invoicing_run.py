@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from unittest.mock import patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+
+class Interrupted(Exception):
+    pass
+
+
+@tagged('post_install', '-at_install')
+class TestSaleInvoicingRun(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.product_a.invoice_policy = 'order'
+        cls.orders = cls.env['sale.order'].create([{
+            'partner_id': cls.partner_a.id,
+            'order_line': [(0, 0, {'product_id': cls.product_a.id, 'product_uom_qty': 1.0})],
+        } for i in range(3)])
+        cls.orders.action_confirm()
+        cls.run = cls.env['sale.invoicing.run'].create({
+            'domain': "[('id', 'in', %s)]" % cls.orders.ids,
+            'grouped': True,
+            'batch_size': 2,
+        })
+
+    def test_resume(self):
+        self.run.action_start()
+        self.assertEqual((self.run.state, self.run.order_count), ('running', 3))
+        self.assertTrue(self.run._process_batch())
+        self.assertEqual(self.run.last_order_id, self.orders[1].id)
+
+        # interrupted before the batch is committed: nothing of it is kept
+        with self.assertRaises(Interrupted):
+            with self.env.cr.savepoint():
+                self.run._process_batch()
+                raise Interrupted()
+        self.env['base'].invalidate_cache()
+        self.assertEqual(self.run.last_order_id, self.orders[1].id)
+        self.assertFalse(self.orders[2].invoice_ids)
+
+        self.run._cron_process_runs()
+        self.assertEqual(self.run.state, 'done')
+        self.assertEqual(self.run.done_count, 3)
+        for order in self.orders:
+            self.assertEqual(len(order.invoice_ids), 1)
+        self.assertEqual(self.run.move_ids, self.orders.invoice_ids)
+
+        # invoiced orders no longer match: starting over creates no duplicate
+        self.run.action_start()
+        self.assertEqual(self.run.order_count, 0)
+        self.run._cron_process_runs()
+        self.assertEqual(len(self.orders.invoice_ids), 3)
+
+    def test_failing_order(self):
+        failing = self.orders[1]
+        SaleOrder = type(self.env['sale.order'])
+        create_invoices = SaleOrder._create_invoices
+
+        def _create_invoices(orders, *args, **kwargs):
+            if failing in orders:
+                raise UserError("Kein Ertragskonto")
+            return create_invoices(orders, *args, **kwargs)
+
+        self.run.batch_size = 3
+        self.run.action_start()
+        with patch.object(SaleOrder, '_create_invoices', _create_invoices):
+            self.run._cron_process_runs()
+        self.assertEqual(self.run.state, 'done')
+        self.assertEqual(self.run.failed_order_ids, failing)
+        self.assertIn(failing.name, self.run.message)
+        self.assertFalse(failing.invoice_ids)
+        for order in self.orders - failing:
+            self.assertEqual(len(order.invoice_ids), 1)
+        self.assertEqual(self.run.move_ids, (self.orders - failing).invoice_ids)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSaleOrderTemplateApply(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.template = cls.env['sale.order.template'].create({
+            'name': "Template",
+            'sale_order_template_line_ids': [(0, 0, {
+                'name': cls.product_b.name,
+                'product_id': cls.product_b.id,
+                'product_uom_qty': 2.0,
+                'product_uom_id': cls.product_b.uom_id.id,
+            })],
+        })
+        cls.orders = cls.env['sale.order'].create([{
+            'partner_id': cls.partner_a.id,
+            'order_line': [(0, 0, {'product_id': cls.product_a.id, 'product_uom_qty': 1.0})],
+        } for i in range(3)])
+
+    def test_apply_in_batches(self):
+        wizard = self.env['sale.order.template.apply'].with_context(active_ids=self.orders.ids).create({
+            'sale_order_template_id': self.template.id,
+        })
+        run = self.env['sale.order.template.apply.run'].browse(wizard.action_apply()['res_id'])
+        run.batch_size = 2
+        self.assertEqual((run.state, run.order_count), ('running', 3))
+
+        self.assertTrue(run._process_batch())
+        self.assertEqual(run.done_order_ids, self.orders[:2])
+        self.assertEqual(run.order_ids, self.orders[2:])
+        self.assertEqual(run.done_count, 2)
+
+        run._cron_process_runs()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.done_order_ids, self.orders)
+        for order in self.orders:
+            self.assertEqual(order.order_line.product_id, self.product_a | self.product_b)
+
+        # running the queue again applies nothing twice
+        run._cron_process_runs()
+        self.assertEqual(self.orders.order_line.mapped('product_id'), self.product_a | self.product_b)
+        self.assertEqual(len(self.orders.order_line), 6)
+
+    def _create_pricing_template(self, count):
+        uom_unit = self.env.ref('uom.product_uom_unit')
+        uom_dozen = self.env.ref('uom.product_uom_dozen')
+        products = self.env['product.product'].create([{
+            'name': "Produkt %s" % i,
+            'lst_price': 10.0 + i,
+            'uom_id': uom_unit.id,
+            'uom_po_id': uom_unit.id,
+        } for i in range(count)])
+        return self.env['sale.order.template'].create({
+            'name': "Template %s" % count,
+            'sale_order_template_line_ids': [(0, 0, {
+                'name': product.name,
+                'product_id': product.id,
+                'product_uom_qty': 1.0,
+                'product_uom_id': (uom_unit if i % 2 else uom_dozen).id,
+            }) for i, product in enumerate(products)],
+        })
+
+    def test_template_prices(self):
+        template = self._create_pricing_template(4)
+        order = self.orders[0]
+        for discount_policy in ('with_discount', 'without_discount'):
+            order.pricelist_id = self.env['product.pricelist'].create({
+                'name': discount_policy,
+                'discount_policy': discount_policy,
+                'item_ids': [(0, 0, {
+                    'compute_price': 'percentage',
+                    'percent_price': 20.0,
+                    'applied_on': '3_global',
+                })],
+            })
+            prices = order._get_template_line_prices(template.sale_order_template_line_ids)
+            for line in template.sale_order_template_line_ids:
+                # the price given by the former line by line pricing
+                price = line.product_id.lst_price
+                discount = 0
+                pricelist_price = order.pricelist_id.with_context(uom=line.product_uom_id.id).get_product_price(line.product_id, 1, False)
+                if discount_policy == 'without_discount' and price:
+                    discount = max(0, (price - pricelist_price) * 100 / price)
+                else:
+                    price = pricelist_price
+                self.assertEqual(prices[line.id], (price, discount))
+
+    def test_template_query_count(self):
+        order = self.orders[0]
+        order._get_template_line_commands(self._create_pricing_template(2))
+        query_counts = []
+        for count in (2, 20):
+            template = self._create_pricing_template(count)
+            self.env['base'].flush()
+            self.env['base'].invalidate_cache()
+            query_count = self.cr.sql_log_count
+            order._get_template_line_commands(template)
+            query_counts.append(self.cr.sql_log_count - query_count)
+        self.assertEqual(query_counts[0], query_counts[1])
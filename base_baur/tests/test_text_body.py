@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestTextBody(TransactionCase):
+
+    def setUp(self):
+        super(TestTextBody, self).setUp()
+        self.template = self.env['sale.order.template'].create({'name': "Template"})
+
+    def test_shared_body(self):
+        other = self.template.copy()
+        self.template.freier_text = "<p>Lieferung ab Lager</p>"
+        other.freier_text = "<p>Lieferung ab Lager</p>"
+        body = self.template.freier_text_body_id
+        self.assertTrue(body)
+        self.assertEqual(other.freier_text_body_id, body)
+
+        # copy-on-write: editing one document leaves the body of the other
+        other.freier_text = "<p>Lieferung ab Werk</p>"
+        self.assertNotEqual(other.freier_text_body_id, body)
+        self.assertEqual(self.template.freier_text, "<p>Lieferung ab Lager</p>")
+        with self.assertRaises(UserError):
+            body.write({'body': "<p>Lieferung ab Werk</p>"})
+
+    def test_sanitize(self):
+        self.template.freier_text = '<p onclick="alert(1)" data-x="1">Text</p><script>alert(1)</script>'
+        body = self.template.freier_text_body_id.body
+        self.assertNotIn('onclick', body)
+        self.assertNotIn('data-x', body)
+        self.assertNotIn('script', body)
+        # the sanitized text read back from the document is found as is
+        other = self.template.copy()
+        other.freier_text = self.template.freier_text
+        self.assertEqual(other.freier_text_body_id, self.template.freier_text_body_id)
+
+    def test_gc(self):
+        self.template.freier_text = "<p>Alt</p>"
+        body = self.template.freier_text_body_id
+        self.template.freier_text = "<p>Neu</p>"
+        self.env['text.body']._gc_unused_bodies()
+        self.assertFalse(body.exists())
+        self.assertTrue(self.template.freier_text_body_id.exists())
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from . import sale_order_template_apply
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Powered by Mindphin Technologies.
+from odoo import fields, models
+
+
+class SaleOrderTemplateApply(models.TransientModel):
+    _name = "sale.order.template.apply"
+    _description = "Apply a Quotation Template to Quotations"
+
+    sale_order_template_id = fields.Many2one('sale.order.template', string="Quotation Template", required=True)
+    order_ids = fields.Many2many('sale.order', string="Quotations",
+                                 default=lambda self: self.env.context.get('active_ids'),
+                                 domain=[('state', 'in', ('draft', 'sent'))])
+
+    def action_apply(self):
+        """Hand the quotations over to a background run, which applies the
+        template in committed batches and can be followed from its form."""
+        self.ensure_one()
+        run = self.env['sale.order.template.apply.run'].create({
+            'sale_order_template_id': self.sale_order_template_id.id,
+            'order_ids': [(6, 0, self.order_ids.ids)],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': run._name,
+            'res_id': run.id,
+            'view_mode': 'form',
+        }
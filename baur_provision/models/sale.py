@@ -9,10 +9,10 @@ class SaleOrder(models.Model):
 
     vermittelt_durch_id = fields.Many2one('res.partner', string="(sd) vermittelt durch")
 
-    def _create_invoices(self, grouped=False, final=False, date=None):
-        res = super(SaleOrder, self)._create_invoices(grouped=grouped, final=final, date=date)
-        res.vermittelt_durch_id = self.vermittelt_durch_id if self.vermittelt_durch_id else None
-        return res
+    def _prepare_invoice(self):
+        invoice_vals = super(SaleOrder, self)._prepare_invoice()
+        invoice_vals['vermittelt_durch_id'] = self.vermittelt_durch_id.id
+        return invoice_vals
 
 
 class AccountMove(models.Model):
@@ -26,5 +26,5 @@ class SaleAdvancePaymentInv(models.TransientModel):
 
     def _prepare_invoice_values(self, order, name, amount, so_line):
         res = super(SaleAdvancePaymentInv, self)._prepare_invoice_values(order, name, amount, so_line)
-        res['vermittelt_durch_id'] = order.vermittelt_durch_id if order.vermittelt_durch_id else None
+        res['vermittelt_durch_id'] = order.vermittelt_durch_id.id
         return res
@@ -18,7 +18,9 @@
         'views/view_res_partner.xml',
         'views/view_res_company.xml',
         'views/sale.xml',
+        'views/qrcode_scan_inbox.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
 
     ],
     'installable': True,
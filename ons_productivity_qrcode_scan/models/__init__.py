@@ -4,5 +4,7 @@
 
 from . import res_partner
 from . import res_company
+from . import account_move
+from . import qrcode_scan_inbox
 from . import sale
 from . import sale_report
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+from odoo import models, fields, api
+from odoo.addons.base.models.res_bank import sanitize_account_number
+
+
+def qr_fingerprint(iban, reference, amount, currency):
+    """Return the fingerprint of a QR bill: a hash of its creditor IBAN,
+    reference, amount and currency. Bills without reference have none, as
+    nothing tells two of them apart from a bill scanned twice."""
+    reference = (reference or '').replace(' ', '').upper()
+    if not reference:
+        return False
+    value = '|'.join([
+        sanitize_account_number(iban) or '',
+        reference,
+        '%.2f' % float(amount or 0),
+        (currency or '').strip().upper(),
+    ])
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    qr_fingerprint = fields.Char(string="QR fingerprint", index=True, copy=False, readonly=True,
+                                 help="Identifies the QR code the bill was imported from, to detect bills scanned twice.")
+
+    @api.model
+    def _qr_find_duplicates(self, fingerprints):
+        """Return the bills, not cancelled, already imported from the given
+        QR fingerprints, with a single indexed query.
+
+        :return: dict mapping the fingerprints already imported to their bill
+        """
+        fingerprints = [fingerprint for fingerprint in set(fingerprints) if fingerprint]
+        if not fingerprints:
+            return {}
+        moves = self.search([('qr_fingerprint', 'in', fingerprints), ('state', '!=', 'cancel')], order='id')
+        duplicates = {}
+        for move in moves:
+            duplicates.setdefault(move.qr_fingerprint, move)
+        return duplicates
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import hashlib
+import logging
+import os
+import threading
+
+from odoo import models, fields, api
+
+from ..qr_bill import split_qr_payloads
+
+_logger = logging.getLogger(__name__)
+
+INBOX_PATH_PARAM = 'ons_productivity_qrcode_scan.inbox_path'
+BATCH_SIZE = 100
+
+
+class QrCodeScanInbox(models.Model):
+    _name = 'qrcode.scan.inbox'
+    _description = "QR code waiting to be imported as a draft vendor bill"
+    _order = 'id desc'
+
+    name = fields.Char(string='Source', readonly=True)
+    payload = fields.Text(string='Valeur du QR', required=True)
+    payload_hash = fields.Char(index=True, readonly=True, copy=False)
+    state = fields.Selection([
+        ('pending', 'En attente'),
+        ('done', 'Facture créée'),
+        ('error', 'Erreur'),
+        ('skipped', 'Ignoré'),
+    ], string='Statut', default='pending', required=True, index=True, readonly=True)
+    message = fields.Text(string='Message', readonly=True)
+    move_id = fields.Many2one('account.move', string='Facture', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', required=True, default=lambda self: self.env.company)
+
+    @api.model
+    def _hash_payload(self, payload):
+        return hashlib.sha1(payload.strip().encode()).hexdigest()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals['payload_hash'] = self._hash_payload(vals.get('payload') or '')
+        return super().create(vals_list)
+
+    @api.model
+    def _enqueue_payloads(self, text, name=False):
+        """Queue the QR payloads held by ``text``. A payload already queued,
+        or met twice in ``text``, is recorded as skipped instead, so that
+        reading the same export twice is harmless yet visible; a skipped
+        payload sent again on purpose can still be queued with
+        ``action_retry``."""
+        payloads = split_qr_payloads(text)
+        if not payloads:
+            return self.browse()
+        hashes = [self._hash_payload(payload) for payload in payloads]
+        sources = {}
+        for record in self.search([('payload_hash', 'in', list(set(hashes))), ('state', '!=', 'skipped')], order='id'):
+            sources.setdefault(record.payload_hash, record.name or record.create_date)
+        vals_list = []
+        for payload, payload_hash in zip(payloads, hashes):
+            vals = {'name': name, 'payload': payload}
+            if payload_hash in sources:
+                vals.update(state='skipped', message="Ce QR code a déjà été reçu (%s)." % sources[payload_hash])
+            else:
+                sources[payload_hash] = name
+            vals_list.append(vals)
+        return self.create(vals_list)
+
+    @api.model
+    def _ingest_drop_folder(self, auto_commit=True):
+        """Queue the payloads of the files of the drop folder, then move each
+        file to its ``processed`` (or ``error``) subfolder. Each file is read
+        in a savepoint, so that a faulty file loses none of the payloads
+        queued from the others, and is only moved once the transaction
+        holding its payloads is committed: until then, it is read again by
+        the next run, its payloads then being recorded as skipped."""
+        path = self.env['ir.config_parameter'].sudo().get_param(INBOX_PATH_PARAM)
+        if not path:
+            return
+        if not os.path.isdir(path):
+            _logger.warning("QR code drop folder %s does not exist", path)
+            return
+        for filename in sorted(os.listdir(path)):
+            filepath = os.path.join(path, filename)
+            if not os.path.isfile(filepath):
+                continue
+            target = 'processed'
+            try:
+                with self.env.cr.savepoint():
+                    with open(filepath, 'rb') as f:
+                        content = f.read()
+                    try:
+                        text = content.decode('utf-8-sig')
+                    except UnicodeDecodeError:
+                        text = content.decode('latin-1')
+                    records = self._enqueue_payloads(text, name=filename)
+                    _logger.info("Queued %d QR codes from %s", len(records), filepath)
+            except Exception:
+                _logger.exception("Could not read QR code file %s", filepath)
+                target = 'error'
+            self.env.cr.postcommit.add(functools.partial(self._move_drop_file, path, filename, target))
+            if auto_commit:
+                self.env.cr.commit()
+
+    @api.model
+    def _move_drop_file(self, path, filename, target):
+        filepath = os.path.join(path, filename)
+        if not os.path.isfile(filepath):
+            return
+        os.makedirs(os.path.join(path, target), exist_ok=True)
+        os.replace(filepath, os.path.join(path, target, filename))
+
+    def _process(self, cache=None):
+        """Create the bills of the queued payloads, per company."""
+        cache = {} if cache is None else cache
+        for company in self.company_id:
+            records = self.filtered(lambda record: record.company_id == company)
+            wizard = self.env['qrcode.scan'].with_company(company)
+            snapshot = wizard._copy_import_cache(cache)
+            try:
+                with self.env.cr.savepoint():
+                    results = wizard._import_qrcode_payloads(records.mapped('payload'), cache)
+            except Exception as e:
+                _logger.exception("Import of queued QR codes failed")
+                # the suppliers and bank accounts created meanwhile are rolled
+                # back, they must not be handed out from the cache anymore
+                cache.clear()
+                cache.update(snapshot)
+                records.write({'state': 'error', 'message': str(e)})
+                continue
+            for record, result in zip(records, results):
+                record.write({
+                    'state': 'error' if result['error'] else 'done',
+                    'message': result['error'] or False,
+                    'move_id': result['move'].id,
+                })
+
+    @api.model
+    def _cron_process_inbox(self, batch_size=BATCH_SIZE):
+        """Import the drop folder and the queued payloads, in committed
+        batches: a crash only loses the batch in progress, whose payloads are
+        still pending and picked up by the next run."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self._ingest_drop_folder(auto_commit=auto_commit)
+        cache = {}
+        while True:
+            records = self.search([('state', '=', 'pending')], order='id', limit=batch_size)
+            if not records:
+                break
+            records._process(cache)
+            _logger.info("Processed %d queued QR codes", len(records))
+            if not auto_commit:
+                break
+            self.env.cr.commit()
+
+    def action_retry(self):
+        self.filtered(lambda record: record.state in ('error', 'skipped')).write({'state': 'pending', 'message': False})
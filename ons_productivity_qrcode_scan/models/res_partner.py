@@ -1,9 +1,64 @@
 # -*- coding: utf-8 -*-
 
+import re
+import unicodedata
+
 from odoo import models, fields, api
 
+
+def normalize_qr_address(name, street, zip_code, city):
+    """Return the key a QR creditor address is matched on: each part
+    lowercased, without accents, spaces nor punctuation, joined by ``|``."""
+    parts = []
+    for value in (name, street, zip_code, city):
+        value = unicodedata.normalize('NFKD', value or '')
+        value = ''.join(char for char in value if not unicodedata.combining(char))
+        parts.append(re.sub(r'[\W_]+', '', value.lower()))
+    return '|'.join(parts)
+
+
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
     qr_product_id = fields.Many2one('product.product', string='Product')
     qr_account_tax_id = fields.Many2one('account.tax', string="Tax")
+    qr_address_key = fields.Char(string="QR address key", compute='_compute_qr_address_key', store=True, index=True)
+
+    @api.depends('name', 'street', 'zip', 'city')
+    def _compute_qr_address_key(self):
+        for partner in self:
+            if partner.name:
+                partner.qr_address_key = normalize_qr_address(partner.name, partner.street, partner.zip, partner.city)
+            else:
+                partner.qr_address_key = False
+
+    @api.model
+    def _qr_find_by_address(self, addresses):
+        """Match QR creditor addresses to partners with a single indexed
+        query.
+
+        :param addresses: iterable of ``(name, street, zip, city)`` tuples
+        :return: dict mapping each address to its partner, or to an empty
+            recordset when there is none
+        """
+        keys = {address: normalize_qr_address(*address) for address in addresses}
+        if not keys:
+            return {}
+        by_key = {}
+        for partner in self.search([('qr_address_key', 'in', list(set(keys.values())))], order='id'):
+            by_key.setdefault(partner.qr_address_key, partner)
+        return {address: by_key.get(key, self.browse()) for address, key in keys.items()}
+
+    def _qr_get_product_tax(self, company):
+        """Return the product and tax of the QR bills of the partners in
+        ``company``: the partner's own ones, else the company's ones. The
+        fields of all the partners are read with a single query.
+
+        :return: dict mapping each partner id to a ``(product, tax)`` tuple,
+            an empty recordset of partners is mapped as well (on ``False``)
+        """
+        default = (company.qr_product_id, company.qr_account_tax_id)
+        result = {False: default}
+        for partner in self:
+            result[partner.id] = (partner.qr_product_id or default[0], partner.qr_account_tax_id or default[1])
+        return result
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Parser of the Swiss QR-bill payload (``SPC`` QR code, version 2.x).
+
+Plain Python, independent of the ORM, so that payloads can be parsed and
+validated before any database work, e.g.::
+
+    bill = parse_qr_bill(payload)
+    bill.creditor.name, bill.amount, bill.reference
+
+Invalid payloads raise ``QrBillError``.
+"""
+
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+HEADER = 'SPC'
+TRAILER = 'EPD'
+CODING = '1'
+CURRENCIES = ('CHF', 'EUR')
+IBAN_COUNTRIES = ('CH', 'LI')
+# lines up to and including the trailer, the optional billing information
+# and alternative schemes come after
+MIN_LINES = 31
+
+_QRR_TABLE = (0, 9, 4, 6, 8, 2, 7, 1, 3, 5)
+
+
+class QrBillError(ValueError):
+    """The payload is not a valid Swiss QR-bill."""
+
+
+class QrAddress(namedtuple('QrAddress', [
+        'address_type', 'name', 'line1', 'line2', 'postal_code', 'town', 'country'])):
+    """Address of a QR-bill party. With a structured address (type ``S``)
+    ``line1`` and ``line2`` are the street and the building number, with a
+    combined one (type ``K``) they are the address lines and the postal code
+    and town are both in ``line2``."""
+    __slots__ = ()
+
+    @property
+    def street(self):
+        if self.address_type == 'S':
+            return ' '.join(part for part in (self.line1, self.line2) if part)
+        return self.line1
+
+    @property
+    def zip(self):
+        if self.address_type == 'K':
+            return self.line2.split(' ', 1)[0]
+        return self.postal_code
+
+    @property
+    def city(self):
+        if self.address_type == 'K':
+            parts = self.line2.split(' ', 1)
+            return parts[1].strip() if len(parts) > 1 else ''
+        return self.town
+
+
+QrBill = namedtuple('QrBill', [
+    'version', 'coding', 'iban', 'creditor', 'ultimate_creditor', 'amount',
+    'currency', 'debtor', 'reference_type', 'reference', 'message',
+    'billing_information', 'alternative_schemes',
+])
+QrBill.__doc__ = """Content of a Swiss QR-bill. ``amount`` is a ``Decimal``
+or ``None`` when left open, ``ultimate_creditor`` and ``debtor`` are
+``None`` when not given."""
+
+
+def iban_is_valid(iban):
+    """Check the ISO 13616 checksum of an IBAN (without spaces)."""
+    if len(iban) < 5 or not iban.isascii() or not iban.isalnum():
+        return False
+    rearranged = iban[4:] + iban[:4]
+    digits = ''.join(str(int(char, 36)) for char in rearranged)
+    return int(digits) % 97 == 1
+
+
+def qrr_is_valid(reference):
+    """Check the modulo 10 recursive checksum of a QR reference."""
+    if len(reference) != 27 or not reference.isascii() or not reference.isdigit():
+        return False
+    carry = 0
+    for digit in reference[:-1]:
+        carry = _QRR_TABLE[(carry + int(digit)) % 10]
+    return (10 - carry) % 10 == int(reference[-1])
+
+
+def scor_is_valid(reference):
+    """Check the ISO 11649 checksum of a creditor reference."""
+    if not 5 <= len(reference) <= 25 or not reference.startswith('RF'):
+        return False
+    return iban_is_valid(reference)
+
+
+def _parse_address(lines, index, required):
+    values = lines[index:index + 7]
+    if not any(values):
+        if required:
+            raise QrBillError("The creditor address is missing.")
+        return None
+    address = QrAddress(*values)
+    if address.address_type not in ('S', 'K'):
+        raise QrBillError("Unknown address type.")
+    if not address.name:
+        raise QrBillError("An address of the QR code has no name.")
+    return address
+
+
+def parse_qr_bill(payload):
+    """Parse and validate a Swiss QR-bill payload.
+
+    :param payload: text of the QR code, lines separated by LF or CRLF
+    :return: a ``QrBill``
+    :raise QrBillError: if the payload is malformed
+    """
+    lines = [line.strip() for line in payload.splitlines()]
+    if not lines or lines[0] != HEADER:
+        raise QrBillError("This is not a Swiss QR-bill code (no SPC header).")
+    if len(lines) < MIN_LINES:
+        raise QrBillError("The QR code is incomplete, please scan it again.")
+    version, coding = lines[1], lines[2]
+    if not version.startswith('02'):
+        raise QrBillError("Unsupported QR-bill version %s." % version)
+    if coding != CODING:
+        raise QrBillError("Unsupported QR-bill coding %s." % coding)
+    if lines[30] != TRAILER:
+        raise QrBillError("The QR code is incomplete, please scan it again.")
+
+    iban = lines[3].replace(' ', '').upper()
+    if iban[:2] not in IBAN_COUNTRIES or len(iban) != 21 or not iban_is_valid(iban):
+        raise QrBillError("The IBAN %s of the QR code is invalid." % lines[3])
+
+    amount = None
+    if lines[18]:
+        try:
+            amount = Decimal(lines[18])
+        except InvalidOperation:
+            raise QrBillError("The amount %s of the QR code is invalid." % lines[18])
+        if not amount.is_finite() or amount < 0:
+            raise QrBillError("The amount %s of the QR code is invalid." % lines[18])
+    currency = lines[19]
+    if currency not in CURRENCIES:
+        raise QrBillError("The currency %s of the QR code is not supported." % currency)
+
+    reference_type, reference = lines[27], lines[28].replace(' ', '')
+    if reference_type == 'QRR':
+        if not qrr_is_valid(reference):
+            raise QrBillError("The QR reference %s is invalid." % lines[28])
+    elif reference_type == 'SCOR':
+        if not scor_is_valid(reference):
+            raise QrBillError("The creditor reference %s is invalid." % lines[28])
+    elif reference_type == 'NON':
+        if reference:
+            raise QrBillError("A QR code without reference type cannot have a reference.")
+    else:
+        raise QrBillError("Unknown reference type %s." % reference_type)
+
+    return QrBill(
+        version=version,
+        coding=coding,
+        iban=iban,
+        creditor=_parse_address(lines, 4, True),
+        ultimate_creditor=_parse_address(lines, 11, False),
+        amount=amount,
+        currency=currency,
+        debtor=_parse_address(lines, 20, False),
+        reference_type=reference_type,
+        reference=reference,
+        message=lines[29],
+        billing_information=lines[31] if len(lines) > 31 else '',
+        alternative_schemes=tuple(line for line in lines[32:34] if line),
+    )
+
+
+def split_qr_payloads(text):
+    """Split a text holding several QR payloads one after the other (as sent
+    by a scanner or exported to a file) into single payloads, each one
+    starting with its ``SPC`` header line."""
+    payloads = []
+    for line in (text or '').splitlines():
+        if line.strip() == HEADER or not payloads:
+            payloads.append([])
+        payloads[-1].append(line)
+    return ['\n'.join(lines).strip() for lines in payloads if ''.join(lines).strip()]
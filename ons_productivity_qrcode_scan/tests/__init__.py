@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import test_qr_bill
+from . import test_qr_code_scan
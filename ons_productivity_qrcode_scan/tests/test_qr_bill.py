@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import time
+from decimal import Decimal
+
+from odoo.tests.common import BaseCase
+
+from ..qr_bill import QrBillError, iban_is_valid, parse_qr_bill, qrr_is_valid, scor_is_valid, split_qr_payloads
+
+_logger = logging.getLogger(__name__)
+
+# example of the Swiss implementation guidelines for the QR-bill
+PAYLOAD_LINES = [
+    'SPC', '0200', '1', 'CH4431999123000889012',
+    'S', 'Robert Schneider AG', 'Rue du Lac', '1268', '2501', 'Biel', 'CH',
+    '', '', '', '', '', '', '',
+    '1949.75', 'CHF',
+    'S', 'Pia-Maria Rutschmann-Schnyder', 'Grosse Marktgasse', '28', '9400', 'Rorschach', 'CH',
+    'QRR', '210000000003139471430009017', 'Order of 15 June 2020', 'EPD',
+    '//S1/10/10201409/11/200701/20/140.000-53/30/102673831/31/200615/32/7.7/33/7.7:139.40/40/0:30',
+]
+
+
+def make_payload(**changes):
+    """Return the example payload with some lines replaced, by index."""
+    lines = list(PAYLOAD_LINES)
+    for index, value in changes.items():
+        lines[int(index.lstrip('l'))] = value
+    return '\r\n'.join(lines)
+
+
+class TestQrBill(BaseCase):
+
+    def test_parse(self):
+        bill = parse_qr_bill(make_payload())
+        self.assertEqual(bill.iban, 'CH4431999123000889012')
+        self.assertEqual(bill.creditor.name, 'Robert Schneider AG')
+        self.assertEqual(bill.creditor.street, 'Rue du Lac 1268')
+        self.assertEqual((bill.creditor.zip, bill.creditor.city), ('2501', 'Biel'))
+        self.assertEqual(bill.amount, Decimal('1949.75'))
+        self.assertEqual(bill.currency, 'CHF')
+        self.assertEqual(bill.debtor.town, 'Rorschach')
+        self.assertIsNone(bill.ultimate_creditor)
+        self.assertEqual((bill.reference_type, bill.reference), ('QRR', '210000000003139471430009017'))
+        self.assertEqual(bill.message, 'Order of 15 June 2020')
+        self.assertTrue(bill.billing_information.startswith('//S1/'))
+        with self.assertRaises(AttributeError):
+            bill.amount = 0
+
+    def test_parse_combined_address(self):
+        bill = parse_qr_bill(make_payload(l4='K', l6='Rue du Lac 1268', l7='2501 Biel', l8='', l9=''))
+        self.assertEqual(bill.creditor.street, 'Rue du Lac 1268')
+        self.assertEqual((bill.creditor.zip, bill.creditor.city), ('2501', 'Biel'))
+
+    def test_parse_creditor_reference(self):
+        bill = parse_qr_bill(make_payload(l27='SCOR', l28='RF18 5390 0754 7034'))
+        self.assertEqual(bill.reference, 'RF18539007547034')
+        bill = parse_qr_bill(make_payload(l18='', l27='NON', l28=''))
+        self.assertIsNone(bill.amount)
+
+    def test_parse_invalid(self):
+        invalid_payloads = [
+            make_payload(l0='XYZ'),
+            make_payload(l1='0100'),
+            make_payload(l3='CH4431999123000889013'),
+            make_payload(l3='DE89370400440532013000'),
+            make_payload(l4='Z'),
+            make_payload(l18='12,50'),
+            make_payload(l19='USD'),
+            make_payload(l28='210000000003139471430009018'),
+            make_payload(l27='SCOR', l28='RF19 5390 0754 7034'),
+            make_payload(l27='NON'),
+            make_payload(l30=''),
+            '\n'.join(PAYLOAD_LINES[:20]),
+        ]
+        for payload in invalid_payloads:
+            with self.assertRaises(QrBillError):
+                parse_qr_bill(payload)
+
+    def test_non_ascii(self):
+        # accepted by str.isalnum() / str.isdigit(), but not by int()
+        self.assertFalse(iban_is_valid('CH44310000000000000É0'))
+        self.assertFalse(qrr_is_valid('²' * 27))
+        self.assertFalse(qrr_is_valid('٣' * 27))
+        self.assertFalse(scor_is_valid('RF18É390075470'))
+        for payload in (
+            make_payload(l3='CH44310000000000000É0'),
+            make_payload(l28='²' * 27),
+            make_payload(l27='SCOR', l28='RF18É390075470'),
+        ):
+            with self.assertRaises(QrBillError):
+                parse_qr_bill(payload)
+
+    def test_split(self):
+        text = '\n\n'.join(make_payload(l28=reference) for reference in (
+            '210000000003139471430009017', '000000000000000000000000000'))
+        payloads = split_qr_payloads(text)
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(parse_qr_bill(payloads[1]).reference, '000000000000000000000000000')
+
+    def test_parse_throughput(self):
+        payloads = [make_payload(l18='%d.%02d' % (index, index % 100)) for index in range(5000)]
+        start = time.time()
+        for payload in payloads:
+            parse_qr_bill(payload)
+        rate = len(payloads) / (time.time() - start)
+        _logger.info("Parsed %d QR-bill payloads at %.0f payloads/s", len(payloads), rate)
+        self.assertGreater(rate, 1000, "Parsing QR-bill payloads became too slow")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .test_qr_bill import make_payload
+
+
+@tagged('post_install', '-at_install')
+class TestQrCodeScan(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref='l10n_ch.l10nch_chart_template'):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env.company.write({
+            'qr_product_id': cls.product_a.id,
+            'qr_account_tax_id': cls.company_data['default_tax_purchase'].id,
+        })
+
+    def _scan(self, payload):
+        wizard = self.env['qrcode.scan'].create({'import_mode': 'single', 'qrcode_value': payload})
+        return self.env['account.move'].browse(wizard.generate_invoice_from_qrcode()['res_id'])
+
+    def _scan_batch(self, payloads):
+        wizard = self.env['qrcode.scan'].create({'import_mode': 'batch', 'qrcode_batch_value': '\n'.join(payloads)})
+        wizard.generate_invoices_from_qrcode_batch()
+        return wizard.result_ids
+
+    def test_single_duplicate(self):
+        move = self._scan(make_payload())
+        self.assertEqual(move.payment_reference, '210000000003139471430009017')
+        with self.assertRaises(UserError):
+            self._scan(make_payload())
+        # another reference is another bill
+        self._scan(make_payload(l28='000000000000000000000000000'))
+
+    def test_batch_duplicate(self):
+        self._scan(make_payload())
+        results = self._scan_batch([
+            make_payload(),
+            make_payload(l28='000000000000000000000000000'),
+            make_payload(l28='000000000000000000000000000'),
+        ])
+        self.assertEqual(results.mapped('state'), ['error', 'done', 'error'])
+        self.assertTrue(results[1].move_id)
+
+    def test_no_reference(self):
+        payload = make_payload(l27='NON', l28='', l29='Rent')
+        first = self._scan(payload)
+        second = self._scan(payload)
+        self.assertNotEqual(first, second)
+        self.assertFalse(first.qr_fingerprint)
+        results = self._scan_batch([payload, payload])
+        self.assertEqual(results.mapped('state'), ['done', 'done'])
+
+    def test_inbox_skipped(self):
+        inbox = self.env['qrcode.scan.inbox']
+        queued = inbox._enqueue_payloads(make_payload(), name='first.txt')
+        self.assertEqual(queued.state, 'pending')
+        again = inbox._enqueue_payloads('\n'.join([make_payload(), make_payload(l28='000000000000000000000000000')]), name='second.txt')
+        self.assertEqual(again.mapped('state'), ['skipped', 'pending'])
+        self.assertIn('first.txt', again[0].message)
+        again[0].action_retry()
+        self.assertEqual(again[0].state, 'pending')
+
+    def test_inbox_rollback_evicts_cache(self):
+        records = self.env['qrcode.scan.inbox']._enqueue_payloads(make_payload())
+        cache = {}
+        wizard_class = type(self.env['qrcode.scan'])
+        with patch.object(wizard_class, '_create_moves', side_effect=Exception("boom")):
+            records._process(cache)
+        self.assertEqual(records.state, 'error')
+        self.assertFalse(any(cache.get('banks', {}).values()))
+        records.action_retry()
+        records._process(cache)
+        self.assertEqual(records.state, 'done')
+        self.assertTrue(records.move_id.partner_bank_id.exists())
+
+    def test_drop_folder_faulty_file(self):
+        inbox = self.env['qrcode.scan.inbox']
+        path = tempfile.mkdtemp()
+        self.env['ir.config_parameter'].sudo().set_param('ons_productivity_qrcode_scan.inbox_path', path)
+        for filename, payload in (('a.txt', make_payload()), ('b.txt', make_payload(l28='000000000000000000000000000'))):
+            with open(os.path.join(path, filename), 'w') as f:
+                f.write(payload)
+        enqueue = type(inbox)._enqueue_payloads
+
+        def enqueue_or_fail(model, text, name=False):
+            records = enqueue(model, text, name=name)
+            if name == 'b.txt':
+                raise ValueError("unreadable")
+            return records
+
+        with patch.object(type(inbox), '_enqueue_payloads', enqueue_or_fail):
+            inbox._ingest_drop_folder(auto_commit=False)
+        # the payloads of a.txt survive the failure of b.txt
+        self.assertEqual(inbox.search([('name', 'in', ('a.txt', 'b.txt'))]).mapped('name'), ['a.txt'])
+        # nothing is moved before the commit
+        self.assertEqual(sorted(os.listdir(path)), ['a.txt', 'b.txt'])
+        self.env.cr.postcommit.run()
+        self.assertEqual(os.listdir(os.path.join(path, 'processed')), ['a.txt'])
+        self.assertEqual(os.listdir(os.path.join(path, 'error')), ['b.txt'])
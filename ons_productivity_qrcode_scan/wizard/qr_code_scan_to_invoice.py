@@ -3,102 +3,237 @@
 # Copyright (c) 2018-TODAY Open-Net Ltd. All rights reserved.
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import base64
 
 from odoo import models, fields, api
+from odoo.addons.base.models.res_bank import sanitize_account_number
 from odoo.exceptions import UserError
 
+from ..models.account_move import qr_fingerprint
+from ..models.res_partner import normalize_qr_address
+from ..qr_bill import QrBillError, parse_qr_bill, split_qr_payloads
+
 
 class QrCodeScanToInvoice(models.TransientModel):
     _name = "qrcode.scan"
     _description = "Generation of a draft invoice from a paper QR code invoice"
 
+    import_mode = fields.Selection([
+        ('single', 'Un QR code'),
+        ('batch', 'Plusieurs QR codes'),
+    ], string="Mode", default='single', required=True)
     qrcode_value = fields.Text(string='Valeur du QR')
+    qrcode_batch_value = fields.Text(string='Valeurs des QR', help="Scannez les QR codes les uns à la suite des autres.")
+    qrcode_batch_file = fields.Binary(string='Fichier des QR')
+    qrcode_batch_filename = fields.Char(string='Nom du fichier')
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    result_ids = fields.One2many('qrcode.scan.result', 'wizard_id', string='Résultats')
 
-    def generate_invoice_from_qrcode(self):
+    @api.model
+    def _split_qrcode_payloads(self, text):
+        return split_qr_payloads(text)
 
-        acc_move = {}
-        supplier_info = {}
-
-        qr_values_tab = self.qrcode_value.split('\n')
-
-        # Supplier infos
-        supplier_info['iban'] = qr_values_tab[3]
-        supplier_info['address_type'] = qr_values_tab[4]
-        supplier_info['name'] = qr_values_tab[5]
-        # ------------------------
-
-        # Account move type
-        acc_move['move_type'] = 'in_invoice'
-
-        # Address Type
-        if supplier_info['address_type'] == 'K':
-            supplier_info['street'] = qr_values_tab[6]
-            supplier_info['zip'] = qr_values_tab[7].split()[0]
-            supplier_info['city'] = qr_values_tab[7].split()[1]
-        elif supplier_info['address_type'] == 'S':
-            supplier_info['street'] = qr_values_tab[6] + " " + qr_values_tab[7]
-            supplier_info['zip'] = qr_values_tab[8]
-            supplier_info['city'] = qr_values_tab[9]
-        else:
-            raise UserError("Unknown address type.")
-        # ------------------------
+    @api.model
+    def _parse_qrcode_value(self, qrcode_value):
+        """Extract from a QR payload the values needed to create the bill."""
+        try:
+            bill = parse_qr_bill(qrcode_value or '')
+        except QrBillError as e:
+            raise UserError(e.args[0])
+        creditor = bill.creditor
+        return {
+            'bill': bill,
+            'supplier_info': {
+                'iban': bill.iban,
+                'address_type': creditor.address_type,
+                'name': creditor.name,
+                'street': creditor.street,
+                'zip': creditor.zip,
+                'city': creditor.city,
+            },
+            'amount': bill.amount or 0.0,
+            'currency': bill.currency,
+            'payment_reference': bill.reference or bill.message,
+        }
 
-        # Account move partner_id
-        supplier = self.env['res.partner'].search([('name', 'ilike', supplier_info['name']), ('street', 'ilike', supplier_info['street']), ('zip', 'ilike', supplier_info['zip']), ('city', 'ilike', supplier_info['city'])], limit=1)
+    def _check_duplicates(self, todo, cache):
+        """Reject the payloads of bills already imported, or met twice among
+        the payloads, looking up all their fingerprints at once. Bills
+        without reference (type ``NON``) are never rejected: recurring bills
+        with the same message and amount cannot be told apart from a bill
+        scanned twice."""
+        seen = set()
+        for item in todo:
+            qr = item['qr']
+            item['fingerprint'] = qr_fingerprint(qr['supplier_info']['iban'], qr['bill'].reference, qr['amount'], qr['currency'])
+        duplicates = self.env['account.move']._qr_find_duplicates(item['fingerprint'] for item in todo)
+        for item in todo:
+            fingerprint = item['fingerprint']
+            if not fingerprint:
+                continue
+            if fingerprint in duplicates:
+                item['error'] = "This bill was already imported: %s" % duplicates[fingerprint].display_name
+            elif fingerprint in seen:
+                item['error'] = "This bill was scanned twice."
+            else:
+                seen.add(fingerprint)
 
-        if supplier:
-            supp_id = supplier.id
-            acc_move['partner_id'] = supp_id
-        else:
-            supp_id = self.env['res.partner'].create({'name': supplier_info['name'], 'street': supplier_info['street'], 'zip': supplier_info['zip'], 'city': supplier_info['city']}).id
-            acc_move['partner_id'] = supp_id
-        # ------------------------
+    def _resolve_suppliers(self, todo, cache):
+        """Find the existing supplier of each payload, the ones not found are
+        created later on, once all the payloads have been checked.
+        All the suppliers are looked up at once on their normalized address
+        (see ``res.partner._qr_find_by_address``)."""
+        for item in todo:
+            info = item['qr']['supplier_info']
+            item['supplier_address'] = (info['name'], info['street'], info['zip'], info['city'])
+            item['supplier_key'] = normalize_qr_address(*item['supplier_address'])
+        suppliers = self.env['res.partner']._qr_find_by_address(item['supplier_address'] for item in todo)
+        for item in todo:
+            item['supplier'] = suppliers[item['supplier_address']]
 
-        # Iban
-        bank_id = self.env['res.partner.bank'].search([('acc_number', '=', supplier_info['iban']), ('partner_id', '=', supplier.id)], limit=1)
-        existing_number_bank_id = self.env['res.partner.bank'].search([('acc_number', '=', supplier_info['iban'])], limit=1)
+    def _resolve_partner_banks(self, todo, cache):
+        """Find the bank account of each payload and check that the IBAN does
+        not belong to another partner.
 
-        if not bank_id and existing_number_bank_id:
-            raise UserError("It seems that the IBAN already exists despite the fact that this debtor does not exist in your database. Please check the name and address of the supplier.")
+        The bank accounts of all the IBANs not met yet during the run are
+        fetched with a single query and kept in ``cache``, both the account of
+        the supplier and the IBAN conflict are derived from that one result.
+        """
+        banks = cache.setdefault('banks', {})
+        for item in todo:
+            item['iban'] = sanitize_account_number(item['qr']['supplier_info']['iban'])
+        missing = {item['iban'] for item in todo} - set(banks)
+        if missing:
+            for iban in missing:
+                banks[iban] = self.env['res.partner.bank']
+            for bank in self.env['res.partner.bank'].search([('sanitized_acc_number', 'in', list(missing))]):
+                banks[bank.sanitized_acc_number] |= bank
+        for item in todo:
+            iban_banks = banks[item['iban']]
+            item['bank'] = iban_banks.filtered(lambda bank: bank.partner_id == item['supplier'])[:1]
+            if not item['bank'] and iban_banks:
+                item['error'] = "It seems that the IBAN already exists despite the fact that this debtor does not exist in your database. Please check the name and address of the supplier."
 
-        if not bank_id:
-            bank_id = self.env['res.partner.bank'].create({'acc_number': supplier_info['iban'], 'partner_id': supp_id})
+    def _resolve_products_taxes(self, todo, cache):
+        """Get the product and tax of the bill line of each payload, from its
+        supplier or else from the company of the bill. They are resolved for
+        all the suppliers not met yet at once and kept in ``cache``."""
+        company = self.env.company
+        products_taxes = cache.setdefault('products_taxes', {}).setdefault(company.id, {})
+        missing = self.env['res.partner'].union(*(item['supplier'] for item in todo))
+        missing = missing.filtered(lambda supplier: supplier.id not in products_taxes)
+        if missing or False not in products_taxes:
+            products_taxes.update(missing._qr_get_product_tax(company))
+        for item in todo:
+            item['product'], item['tax'] = products_taxes[item['supplier'].id]
+            if not item['product']:
+                item['error'] = "Please define QR product on company (account tab)"
+            elif not item['tax']:
+                item['error'] = "Please define QR tax on company (account tab)"
 
-        acc_move['partner_bank_id'] = bank_id.id
-        # ------------------------
+    def _create_missing_suppliers(self, todo):
+        missing = {}
+        for item in todo:
+            if not item['supplier']:
+                info = item['qr']['supplier_info']
+                missing.setdefault(item['supplier_key'], {'name': info['name'], 'street': info['street'], 'zip': info['zip'], 'city': info['city']})
+        if not missing:
+            return
+        partners = self.env['res.partner'].create(list(missing.values()))
+        created = dict(zip(missing, partners))
+        for item in todo:
+            if not item['supplier']:
+                item['supplier'] = created[item['supplier_key']]
 
-        # Reference payment
-        acc_move['payment_reference'] = qr_values_tab[28] or qr_values_tab[29]
+    def _create_missing_partner_banks(self, todo, cache):
+        missing = {}
+        for item in todo:
+            if not item['bank']:
+                missing.setdefault((item['iban'], item['supplier'].id), {'acc_number': item['qr']['supplier_info']['iban'], 'partner_id': item['supplier'].id})
+        if not missing:
+            return
+        banks = self.env['res.partner.bank'].create(list(missing.values()))
+        created = dict(zip(missing, banks))
+        for (iban, partner_id), bank in created.items():
+            cache['banks'][iban] |= bank
+        for item in todo:
+            if not item['bank']:
+                item['bank'] = created[(item['iban'], item['supplier'].id)]
 
-        # Create account move line
-        pid = False
-        if supplier.qr_product_id:
-            pid = supplier.qr_product_id
-        elif self.env.user.company_id.qr_product_id:
-            pid = self.env.user.company_id.qr_product_id
-        else:
-            raise UserError("Please define QR product on company (account tab)")
+    def _prepare_move_vals(self, item):
+        return {
+            'move_type': 'in_invoice',
+            'partner_id': item['supplier'].id,
+            'partner_bank_id': item['bank'].id,
+            'payment_reference': item['qr']['payment_reference'],
+            'qr_fingerprint': item['fingerprint'],
+            'invoice_line_ids': [(0, 0, {
+                'product_id': item['product'].id,
+                'tax_ids': [(6, 0, item['tax'].ids)],
+                'price_unit': float(item['qr']['amount']),
+            })],
+        }
 
-        tax = False
-        if supplier.qr_account_tax_id:
-            tax = supplier.qr_account_tax_id
-        elif self.env.user.company_id.qr_account_tax_id:
-            tax = self.env.user.company_id.qr_account_tax_id
+    def _create_moves(self, todo):
+        """Create the bills of all the payloads at once. Should that fail,
+        they are created one by one so that only the faulty ones are lost."""
+        vals_list = [self._prepare_move_vals(item) for item in todo]
+        try:
+            with self.env.cr.savepoint():
+                moves = self.env['account.move'].create(vals_list)
+        except Exception:
+            for item, vals in zip(todo, vals_list):
+                try:
+                    with self.env.cr.savepoint():
+                        item['move'] = self.env['account.move'].create(vals)
+                except Exception as e:
+                    item['error'] = str(e)
         else:
-            raise UserError("Please define QR tax on company (account tab)")
+            for item, move in zip(todo, moves):
+                item['move'] = move
 
-        account_move_line_dict = {
-            'product_id': pid,
-            'tax_ids': tax,
-            'price_unit': qr_values_tab[18]
-        }
+    @api.model
+    def _copy_import_cache(self, cache):
+        """Return a copy of the import ``cache``, to be restored when the
+        records resolved or created since then are rolled back."""
+        return {key: self._copy_import_cache(value) if isinstance(value, dict) else value
+                for key, value in cache.items()}
+
+    def _import_qrcode_payloads(self, payloads, cache=None):
+        """Create a draft vendor bill for each QR payload.
 
-        acc_move['invoice_line_ids'] = [
-            (0, 0, account_move_line_dict)
-        ]
-        # ------------------------
+        The payloads are all checked before anything is created, the missing
+        suppliers and bank accounts are then created in batch, and so are the
+        bills. ``cache`` keeps what was resolved across several calls made
+        during the same import run.
 
-        res = self.env['account.move'].create(acc_move)
+        :return: a list with, for each payload, a dict holding the created
+            ``move`` or the ``error`` that prevented it
+        """
+        cache = {} if cache is None else cache
+        results = [{'payload': payload, 'move': self.env['account.move'], 'error': False} for payload in payloads]
+        todo = []
+        for item in results:
+            try:
+                item['qr'] = self._parse_qrcode_value(item['payload'])
+            except UserError as e:
+                item['error'] = e.args[0]
+            else:
+                todo.append(item)
+        for resolve in (self._check_duplicates, self._resolve_suppliers, self._resolve_partner_banks, self._resolve_products_taxes):
+            resolve(todo, cache)
+            todo = [item for item in todo if not item['error']]
+        if todo:
+            self._create_missing_suppliers(todo)
+            self._create_missing_partner_banks(todo, cache)
+            self._create_moves(todo)
+        return results
+
+    def generate_invoice_from_qrcode(self):
+        result = self._import_qrcode_payloads([self.qrcode_value])[0]
+        if result['error']:
+            raise UserError(result['error'])
+        res = result['move']
 
         return {
             'name': res.name,
@@ -107,3 +242,57 @@ class QrCodeScanToInvoice(models.TransientModel):
             'res_id': res.id,
             'type': 'ir.actions.act_window',
             }
+
+    def generate_invoices_from_qrcode_batch(self):
+        text = self.qrcode_batch_value or ''
+        if self.qrcode_batch_file:
+            content = base64.b64decode(self.qrcode_batch_file)
+            try:
+                text += '\n' + content.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                text += '\n' + content.decode('latin-1')
+        payloads = self._split_qrcode_payloads(text)
+        if not payloads:
+            raise UserError("Please scan or upload at least one QR code.")
+
+        results = self._import_qrcode_payloads(payloads)
+        self.result_ids = [(5, 0, 0)] + [(0, 0, {
+            'sequence': index,
+            'payload': result['payload'],
+            'state': 'error' if result['error'] else 'done',
+            'message': result['error'] or False,
+            'move_id': result['move'].id,
+        }) for index, result in enumerate(results, 1)]
+        self.state = 'done'
+
+        return {
+            'name': 'Scan QR Code',
+            'view_mode': 'form',
+            'res_model': self._name,
+            'res_id': self.id,
+            'type': 'ir.actions.act_window',
+            'target': 'new',
+            }
+
+    def action_open_moves(self):
+        return {
+            'name': 'Factures',
+            'view_mode': 'tree,form',
+            'res_model': 'account.move',
+            'domain': [('id', 'in', self.result_ids.move_id.ids)],
+            'context': {'default_move_type': 'in_invoice'},
+            'type': 'ir.actions.act_window',
+            }
+
+
+class QrCodeScanResult(models.TransientModel):
+    _name = "qrcode.scan.result"
+    _description = "Result of the import of a QR code"
+    _order = "sequence"
+
+    wizard_id = fields.Many2one('qrcode.scan', required=True, ondelete='cascade')
+    sequence = fields.Integer(string='#')
+    payload = fields.Text(string='Valeur du QR')
+    state = fields.Selection([('done', 'Facture créée'), ('error', 'Erreur')], string='Statut')
+    message = fields.Char(string='Message')
+    move_id = fields.Many2one('account.move', string='Facture')
@@ -2,14 +2,74 @@
 # Copyright 2017 Serpent Consulting Services Pvt. Ltd.
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+import logging
+import time
+
 from odoo import SUPERUSER_ID
 from odoo.api import Environment
 
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+BATCH_SIZE_PARAM = "sale_order_line_sequence.reset_sequence_batch_size"
+CHECKPOINT_PARAM = "sale_order_line_sequence.reset_sequence_last_order_id"
+
+
+def reset_sequence_in_batches(env, batch_size=None, commit=True):
+    """
+    Resets the sequence of the order lines of all the sale orders, by chunks
+    of ``batch_size`` orders taken in id order.
+
+    After each chunk the id of the last processed order is stored in the
+    ``CHECKPOINT_PARAM`` system parameter, the transaction is committed (when
+    ``commit`` is set) and the cache is cleared, so that memory stays bounded
+    and an interrupted run resumes after the last committed chunk.
+    """
+    params = env["ir.config_parameter"].sudo()
+    batch_size = batch_size or int(params.get_param(BATCH_SIZE_PARAM, BATCH_SIZE))
+    last_id = int(params.get_param(CHECKPOINT_PARAM, 0))
+    cr = env.cr
+    cr.execute("SELECT count(*) FROM sale_order WHERE id > %s", [last_id])
+    total = cr.fetchone()[0]
+    if last_id:
+        _logger.info(
+            "Resuming line sequence reset after sale order %s, %s orders left",
+            last_id,
+            total,
+        )
+    done = 0
+    start = time.time()
+    while True:
+        cr.execute(
+            "SELECT id FROM sale_order WHERE id > %s ORDER BY id LIMIT %s",
+            [last_id, batch_size],
+        )
+        order_ids = [row[0] for row in cr.fetchall()]
+        if not order_ids:
+            break
+        env["sale.order"].browse(order_ids)._reset_sequence()
+        last_id = order_ids[-1]
+        params.set_param(CHECKPOINT_PARAM, last_id)
+        env["sale.order"].flush()
+        if commit:
+            cr.commit()
+        env["sale.order"].invalidate_cache()
+        done += len(order_ids)
+        elapsed = time.time() - start
+        _logger.info(
+            "Line sequence reset: %s/%s sale orders (%.0f orders/s)",
+            done,
+            total,
+            done / elapsed if elapsed else done,
+        )
+    # the run is complete, the next one must start from scratch
+    params.set_param(CHECKPOINT_PARAM, False)
+
 
 def post_init_hook(cr, pool):
     """
-    Fetches all the sale order and resets the sequence of the order lines
+    Fetches all the sale order and resets the sequence of the order lines,
+    in committed batches (see ``reset_sequence_in_batches``)
     """
     env = Environment(cr, SUPERUSER_ID, {})
-    sale = env["sale.order"].search([])
-    sale._reset_sequence()
+    reset_sequence_in_batches(env)
@@ -3,41 +3,211 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+# Line fields whose change requires the order lines to be renumbered
+SEQUENCE_TRIGGER_FIELDS = {"display_type", "section_id", "sequence", "sequence2"}
+# Gaps left between the numbers given by SaleOrder._reset_sequence, so that
+# lines can be inserted in between without renumbering the whole order
+SECTION_SEQUENCE_STEP = 1000000
+LINE_SEQUENCE_STEP = 100
 
 
 class SaleOrder(models.Model):
     _inherit = "sale.order"
 
-    @api.depends("order_line")
+    @api.depends("order_line.sequence")
     def _compute_max_line_sequence(self):
         """Allow to know the highest sequence entered in sale order lines.
         Then we add 1 to this value for the next sequence.
         This value is given to the context of the o2m field in the view.
         So when we create new sale order lines, the sequence is automatically
         added as :  max_sequence + 1
+        The maxima of the orders already in database are fetched with one
+        grouped query for the whole recordset, only the orders being edited
+        in a form are computed from their lines in cache.
         """
-        for sale in self:
+        new_sales = self.filtered(lambda sale: isinstance(sale.id, models.NewId))
+        for sale in new_sales:
             sale.max_line_sequence = max(sale.mapped("order_line.sequence") or [0]) + 1
+        sales = self - new_sales
+        if not sales:
+            return
+        self.env["sale.order.line"].flush(["order_id", "sequence"])
+        self.env.cr.execute(
+            """
+            SELECT order_id, MAX(sequence)
+              FROM sale_order_line
+             WHERE order_id IN %s
+          GROUP BY order_id
+            """,
+            [tuple(sales.ids)],
+        )
+        maxima = dict(self.env.cr.fetchall())
+        for sale in sales:
+            sale.max_line_sequence = (maxima.get(sale.id) or 0) + 1
 
     max_line_sequence = fields.Integer(
         string="Max sequence in lines", compute="_compute_max_line_sequence", store=True
     )
 
     def _reset_sequence(self):
-        for rec in self:
-            current_sequence = 1
-            section_sequence = 1
-            for line in rec.order_line:
-                if line.display_type == 'line_section':
-                    section_sequence += 1000
-                    line.sequence2 = section_sequence
-                if line.display_type != 'line_section':
-                    if line.section_id:
-                        line.sequence2 = line.section_id.sequence2+current_sequence
-                    else:
-                        line.sequence2 = section_sequence+current_sequence
-                    current_sequence += 1
-     
+        """Renumber the lines of the orders with a single set-based UPDATE.
+
+        Numbers are sparse so that lines can be inserted without touching
+        their neighbours (see ``AddSection.add_line``): sections get
+        ``1 + SECTION_SEQUENCE_STEP * n`` where ``n`` is their rank among the
+        sections of the order, other lines get the number of their section
+        (``section_id``, or the last section above them when it is not set)
+        plus ``LINE_SEQUENCE_STEP`` times their rank within that section.
+        ``sequence`` is related to ``sequence2`` and is written alongside.
+        """
+        if not self.ids:
+            return
+        line_model = self.env["sale.order.line"]
+        line_model.flush(["order_id", "sequence", "sequence2", "display_type", "section_id"])
+        self.env.cr.execute(
+            """
+            WITH ranked AS (
+                SELECT id, order_id, section_id, sequence,
+                       display_type IS NOT DISTINCT FROM 'line_section' AS is_section,
+                       COUNT(*) FILTER (
+                           WHERE display_type IS NOT DISTINCT FROM 'line_section'
+                       ) OVER (PARTITION BY order_id ORDER BY sequence, id
+                               ROWS UNBOUNDED PRECEDING) AS section_rank
+                  FROM sale_order_line
+                 WHERE order_id IN %(order_ids)s
+            ), grouped AS (
+                SELECT r.id, r.order_id, r.sequence, r.is_section, r.section_rank,
+                       COALESCE(s.section_rank, r.section_rank) AS group_rank
+                  FROM ranked r
+             LEFT JOIN ranked s ON s.id = r.section_id AND s.order_id = r.order_id
+            ), numbered AS (
+                SELECT id,
+                       CASE
+                           WHEN is_section THEN 1 + %(section_step)s * section_rank
+                           ELSE 1 + %(section_step)s * group_rank + %(line_step)s * ROW_NUMBER() OVER (
+                               PARTITION BY order_id, is_section, group_rank
+                               ORDER BY sequence, id
+                           )
+                       END AS sequence2
+                  FROM grouped
+            )
+            UPDATE sale_order_line l
+               SET sequence2 = n.sequence2, sequence = n.sequence2
+              FROM numbered n
+             WHERE l.id = n.id
+               AND (l.sequence2 IS DISTINCT FROM n.sequence2
+                    OR l.sequence IS DISTINCT FROM n.sequence2)
+         RETURNING l.id
+            """,
+            {
+                "order_ids": tuple(self.ids),
+                "section_step": SECTION_SEQUENCE_STEP,
+                "line_step": LINE_SEQUENCE_STEP,
+            },
+        )
+        lines = line_model.browse([row[0] for row in self.env.cr.fetchall()])
+        if lines:
+            lines.invalidate_cache(["sequence", "sequence2"])
+            lines.modified(["sequence", "sequence2"])
+
+    def resequence_lines(self, line_ids, section_ids=None):
+        """Apply a new order of the lines of the order, e.g. after a drag and
+        drop in the order form, in a single UPDATE instead of one write per
+        moved line.
+
+        :param line_ids: ids of all the lines of the order, in their new order
+        :param section_ids: optional mapping ``{line_id: section_id}``; lines
+            missing from it belong to the last section above them
+        :return: True
+        """
+        self.ensure_one()
+        section_ids = {int(k): v for k, v in (section_ids or {}).items()}
+        line_ids = [int(line_id) for line_id in line_ids]
+        lines = self.order_line
+        if len(set(line_ids)) != len(line_ids) or set(line_ids) != set(lines.ids):
+            raise UserError(_("The lines to resequence must be all the lines of the order."))
+        sections = {line.id for line in lines if line.display_type == "line_section"}
+        section_ranks = {}
+        for line_id in line_ids:
+            if line_id in sections:
+                section_ranks[line_id] = len(section_ranks) + 1
+        # same numbering as _reset_sequence, computed for the new order
+        sequences, line_sections = [], []
+        counters = {}
+        current_section = False
+        for line_id in line_ids:
+            if line_id in sections:
+                current_section = line_id
+                sequences.append(1 + SECTION_SEQUENCE_STEP * section_ranks[line_id])
+                line_sections.append(None)
+                continue
+            section = section_ids.get(line_id, current_section)
+            if section not in section_ranks:
+                section = False
+            counters[section] = counters.get(section, 0) + 1
+            sequences.append(
+                1
+                + SECTION_SEQUENCE_STEP * section_ranks.get(section, 0)
+                + LINE_SEQUENCE_STEP * counters[section]
+            )
+            line_sections.append(section or None)
+        lines.flush(["sequence", "sequence2", "section_id"], lines)
+        lines.modified(["section_id"], before=True)
+        self.env.cr.execute(
+            """
+            UPDATE sale_order_line l
+               SET sequence2 = v.sequence2, sequence = v.sequence2, section_id = v.section_id
+              FROM unnest(%s::int[], %s::int[], %s::int[]) AS v(id, sequence2, section_id)
+             WHERE l.id = v.id AND l.order_id = %s
+            """,
+            [line_ids, sequences, line_sections, self.id],
+        )
+        lines.invalidate_cache(["sequence", "sequence2", "section_id"])
+        lines.modified(["sequence", "sequence2", "section_id"])
+        return True
+
+    def _need_reset_sequence(self, vals):
+        """Tell whether the values about to be written on the orders can
+        change the numbering of their lines: lines added, removed or
+        relinked, or lines updated on one of the fields the numbering is
+        based on. The web client links every unchanged line of the order on
+        each save, ``(4, id)`` and ``(6, 0, ids)`` commands keeping the lines
+        the order already has are therefore no change.
+        """
+        commands = vals.get("order_line") or []
+        if not commands:
+            return False
+        line_ids = set(self.order_line.ids) if len(self) == 1 else set()
+        for command in commands:
+            if not isinstance(command, (list, tuple)):
+                return True
+            if command[0] == 4:
+                if command[1] not in line_ids:
+                    return True
+            elif command[0] == 6:
+                if set(command[2]) != line_ids:
+                    return True
+            # (1, id, values) only moves the line if it touches the numbering
+            elif command[0] != 1 or SEQUENCE_TRIGGER_FIELDS.intersection(command[2]):
+                return True
+        return False
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Number the lines of the new orders once, with a single UPDATE for
+        all of them. The lines are otherwise created with ``sequence2`` at
+        0 and only get their gap numbers on the next write touching them, so
+        that the lines of a new order cannot be told apart by their number
+        and ``AddSection.add_line`` has no gap to insert into.
+        """
+        orders = super(SaleOrder, self).create(vals_list)
+        # lines created with keep_line_sequence are renumbered by their create
+        if not self.env.context.get("keep_line_sequence"):
+            orders.filtered("order_line")._reset_sequence()
+        return orders
+
     # def create(self, line_values):
     #     seq=1000
     #     for l in line_values['order_line']:
@@ -45,9 +215,50 @@ class SaleOrder(models.Model):
     #         seq+=1
     #     return super(SaleOrder, self).create(line_values)
 
+    def _get_resequence_line_ids(self, vals):
+        """Tell whether the order lines written on the order only reorder
+        them, as sent by the drag and drop of the order form: one update of
+        ``sequence`` (or ``sequence2``) per moved line, the other lines being
+        linked or left out.
+
+        :return: the ids of all the lines of the order in their new order,
+            or None when the lines must be written as usual
+        """
+        commands = vals.get("order_line")
+        if len(self) != 1 or not commands:
+            return None
+        new_sequences = {}
+        for command in commands:
+            if not isinstance(command, (list, tuple)) or command[0] not in (1, 4):
+                return None
+            if command[0] == 1:
+                values = command[2] or {}
+                if not values or not set(values) <= {"sequence", "sequence2"}:
+                    return None
+                new_sequences[command[1]] = values.get("sequence2", values.get("sequence"))
+        lines = self.order_line
+        if not new_sequences or not set(new_sequences) <= set(lines.ids):
+            return None
+        return [
+            line.id
+            for line in lines.sorted(
+                lambda line: (new_sequences.get(line.id, line.sequence2), line.sequence2, line.id)
+            )
+        ]
+
     def write(self, line_values):
+        line_ids = self._get_resequence_line_ids(line_values)
+        if line_ids is not None:
+            line_values = dict(line_values)
+            del line_values["order_line"]
+            res = super(SaleOrder, self).write(line_values) if line_values else True
+            self.resequence_lines(line_ids)
+            return res
+        # the commands are compared with the lines before the write
+        need_reset = self._need_reset_sequence(line_values)
         res = super(SaleOrder, self).write(line_values)
-        self._reset_sequence()
+        if need_reset:
+            self._reset_sequence()
         return res
 
     def copy(self, default=None):
@@ -66,19 +277,50 @@ class AddSection(models.TransientModel):
     section = fields.Char(string="Section")
     note = fields.Char(string="Note")
     seq = fields.Integer()
+    line_id = fields.Many2one("sale.order.line", string="Line")
+
+    def _get_insert_sequence(self):
+        """Return a free ``sequence2`` right after the line the wizard was
+        opened from, halfway to the next line. The order is renumbered only
+        when there is no gap left between both lines.
+        """
+        line_model = self.env['sale.order.line']
+        for attempt in range(2):
+            previous = self.line_id.sequence2 if self.line_id else self.seq - 1
+            next_line = line_model.search(
+                [('order_id', '=', self.order_id.id), ('sequence2', '>', previous)],
+                order='sequence2', limit=1,
+            )
+            upper = next_line.sequence2 if next_line else previous + 2 * LINE_SEQUENCE_STEP
+            if upper - previous > 1:
+                return (previous + upper) // 2
+            if not attempt:
+                self.order_id._reset_sequence()
+        raise UserError(_("There is no free line number left at this place of the order."))
 
     def add_line(self):
-        if self.env.context.get('active_id'):
-            if self.display_type == 'product':
-                line = self.env['sale.order.line'].create({'product_id': self.product_id.id,'name':'aaa','order_id':self.order_id.id,'sequence2':self.seq})
-                line.product_id_change()
-                next_lines = self.env['sale.order.line'].search([('order_id','=',self.order_id.id),('sequence','>',self.seq),('sequence','<',self.seq+999)])
-                for ll in next_lines:
-                    ll.sequence2 = self.seq+1
-            if self.display_type == 'section':
-                line = self.env['sale.order.line'].create({'name':self.section,'order_id':self.order_id.id,'display_type':'line_section','sequence2':self.seq-1})
-            if self.display_type == 'note':
-                line = self.env['sale.order.line'].create({'name':self.note,'order_id':self.order_id.id,'display_type':'line_note','sequence2':self.seq-1})
+        if not self.env.context.get('active_id'):
+            return
+        values = {
+            'order_id': self.order_id.id,
+            'sequence2': self._get_insert_sequence(),
+        }
+        if self.display_type in ('product', 'note'):
+            # stay in the section of the line the wizard was opened from
+            anchor = self.line_id
+            section = anchor if anchor.display_type == 'line_section' else anchor.section_id
+            values['section_id'] = section.id
+        if self.display_type == 'product':
+            values.update({'product_id': self.product_id.id, 'name': 'aaa'})
+            line = self.env['sale.order.line'].create(values)
+            line.product_id_change()
+        if self.display_type == 'section':
+            values.update({'name': self.section, 'display_type': 'line_section'})
+            self.env['sale.order.line'].create(values)
+        if self.display_type == 'note':
+            values.update({'name': self.note, 'display_type': 'line_note'})
+            self.env['sale.order.line'].create(values)
+
 
 class SaleOrderLine(models.Model):
     _inherit = "sale.order.line"
@@ -101,14 +343,28 @@ class SaleOrderLine(models.Model):
         #store=True,
     )
     section_id = fields.Many2one('sale.order.line', string="Section")
+    # sequence2 leaves gaps between the lines, the number shown to the
+    # users is their rank among the product lines of the order
+    line_number = fields.Integer(string="Line No.", compute="_compute_line_number")
+
+    @api.depends("order_id.order_line.sequence2", "order_id.order_line.display_type")
+    def _compute_line_number(self):
+        self.line_number = 0
+        for order in self.order_id:
+            number = 0
+            for line in order.order_line.sorted(lambda line: line.sequence2):
+                if not line.display_type:
+                    number += 1
+                    line.line_number = number
 
-    @api.model
-    def create(self, values):
-        line = super(SaleOrderLine, self).create(values)
-        # We do not reset the sequence if we are copying a complete sale order
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super(SaleOrderLine, self).create(vals_list)
+        # When copying a complete sale order all its lines are created in one
+        # batch: renumber each order once, not once per line
         if self.env.context.get("keep_line_sequence"):
-            line.order_id._reset_sequence()
-        return line
+            lines.order_id._reset_sequence()
+        return lines
 
     def action_add_section(self):
         return {
@@ -119,5 +375,5 @@ class SaleOrderLine(models.Model):
             'type': 'ir.actions.act_window',
             'target': 'new',
             'domain':[('display_type', '=', 'line_section'), ('order_id', '=', self.order_id)],
-            'context': {'default_order_id': self.order_id.id,'default_seq':self.sequence2+1}
+            'context': {'default_order_id': self.order_id.id,'default_seq':self.sequence2+1,'default_line_id':self.id}
         }        
@@ -1 +1,2 @@
 from . import test_sale_order_line_sequence
+from . import test_sale_order_line_sequence_scaling
@@ -1,8 +1,12 @@
 # Copyright 2019 Ecosoft Co., Ltd (http://ecosoft.co.th/)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html)
 
+from unittest.mock import patch
+
 from odoo.tests.common import TransactionCase
 
+from ..model.sale_order import LINE_SEQUENCE_STEP, SECTION_SEQUENCE_STEP
+
 
 class TestSaleOrderLineSequence(TransactionCase):
     def setUp(self):
@@ -12,24 +16,138 @@ class TestSaleOrderLineSequence(TransactionCase):
         self.partner = self.env.ref("base.res_partner_1")
         self.product = self.env.ref("product.product_product_4")
 
+    def _line_vals(self):
+        return {
+            "product_id": self.product.id,
+            "name": self.product.name,
+            "product_uom_qty": 1.0,
+            "price_unit": self.product.lst_price,
+        }
+
     def test_sale_order_line_sequence(self):
         vals = {
             "partner_id": self.partner.id,
-            "order_line": [
-                (
-                    0,
-                    0,
-                    {
-                        "product_id": self.product.id,
-                        "name": self.product.name,
-                        "product_uom_qty": 1.0,
-                        "price_unit": self.product.lst_price,
-                    },
-                )
-            ],
+            "order_line": [(0, 0, self._line_vals())],
         }
         so1 = self.sale_order.create(vals)
         so1.action_confirm()
-        self.assertEqual(so1.order_line.sequence, 1)
+        self.assertEqual(so1.order_line.line_number, 1)
+        self.assertEqual(so1.order_line.sequence, 1 + LINE_SEQUENCE_STEP)
         so2 = so1.copy()
-        self.assertEqual(so2.order_line.sequence, 1)
+        self.assertEqual(so2.order_line.line_number, 1)
+        self.assertEqual(so2.order_line.sequence, 1 + LINE_SEQUENCE_STEP)
+
+    def test_add_line_without_gap(self):
+        order = self.sale_order.create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [(0, 0, self._line_vals()), (0, 0, self._line_vals())],
+            }
+        )
+        first, second = order.order_line.sorted("sequence")
+        # no free number left between both lines
+        first.sequence2 = 5
+        second.sequence2 = 6
+        wizard = (
+            self.env["add.section"]
+            .with_context(active_id=first.id)
+            .create(
+                {
+                    "order_id": order.id,
+                    "line_id": first.id,
+                    "seq": first.sequence2 + 1,
+                    "display_type": "note",
+                    "note": "Inserted",
+                }
+            )
+        )
+        wizard.add_line()
+        lines = order.order_line.sorted("sequence2")
+        self.assertEqual(lines.mapped("name")[1], "Inserted")
+        self.assertEqual(len(set(lines.mapped("sequence2"))), 3)
+
+    def test_drag_and_drop(self):
+        order = self.sale_order.create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [
+                    (0, 0, {"display_type": "line_section", "name": "Section"}),
+                    (0, 0, self._line_vals()),
+                    (0, 0, self._line_vals()),
+                ],
+            }
+        )
+        section, first, second = order.order_line.sorted("sequence2")
+        # the order form sends the new sequence of each moved line, and
+        # links the other ones
+        order.write(
+            {
+                "order_line": [
+                    (1, second.id, {"sequence": 0}),
+                    (1, section.id, {"sequence": 1}),
+                    (4, first.id, 0),
+                ]
+            }
+        )
+        self.assertEqual(
+            order.order_line.sorted("sequence2").ids, [second.id, section.id, first.id]
+        )
+        self.assertFalse(second.section_id)
+        self.assertEqual(first.section_id, section)
+        self.assertEqual(order.max_line_sequence, first.sequence2 + 1)
+
+    def test_save_without_renumbering(self):
+        order = self.sale_order.create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [(0, 0, self._line_vals()) for i in range(3)],
+            }
+        )
+        first, second, third = order.order_line.sorted("sequence2")
+        self.env["base"].flush()
+        cr = self.env.cr
+        execute = cr.execute
+        with patch.object(cr, "execute", wraps=execute) as mock_execute:
+            # what the order form sends when only a quantity was changed
+            order.write(
+                {
+                    "client_order_ref": "REF",
+                    "order_line": [
+                        (4, first.id, False),
+                        (1, second.id, {"product_uom_qty": 2.0}),
+                        (4, third.id, False),
+                    ],
+                }
+            )
+            order.flush()
+        queries = [str(call.args[0]) for call in mock_execute.call_args_list]
+        self.assertFalse(
+            [query for query in queries if "sequence2" in query and "UPDATE" in query],
+            "Saving the order without moving lines must not renumber them",
+        )
+        self.assertFalse(order._need_reset_sequence({"order_line": [(6, 0, order.order_line.ids)]}))
+        self.assertTrue(order._need_reset_sequence({"order_line": [(6, 0, first.ids)]}))
+        self.assertTrue(order._need_reset_sequence({"order_line": [(0, 0, self._line_vals())]}))
+
+    def test_create_numbers_lines(self):
+        order = self.sale_order.create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [
+                    (0, 0, self._line_vals()),
+                    (0, 0, {"display_type": "line_section", "name": "Section"}),
+                    (0, 0, self._line_vals()),
+                ],
+            }
+        )
+        lines = order.order_line.sorted("sequence2")
+        self.assertEqual(
+            lines.mapped("sequence2"),
+            [
+                1 + LINE_SEQUENCE_STEP,
+                1 + SECTION_SEQUENCE_STEP,
+                1 + SECTION_SEQUENCE_STEP + LINE_SEQUENCE_STEP,
+            ],
+        )
+        self.assertEqual(order.max_line_sequence, lines[-1].sequence2 + 1)
+        self.assertEqual(lines.mapped("line_number"), [1, 0, 2])
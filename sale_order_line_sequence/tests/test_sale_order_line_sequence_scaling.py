@@ -0,0 +1,209 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html)
+
+import time
+
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from ..model.sale_order import LINE_SEQUENCE_STEP, SECTION_SEQUENCE_STEP
+
+
+@tagged("post_install", "-at_install")
+class TestSaleOrderLineSequenceScaling(TransactionCase):
+    """Query counts and timings of the line numbering on orders of 10, 100
+    and 1000 lines: operations on a whole order must not become super-linear
+    in its number of lines. The bigger orders are run under
+    ``assertQueryCount`` with a limit derived from the query count of the
+    smallest one, and the time taken on the biggest order is compared with
+    the one taken on the smallest.
+    """
+
+    SIZES = (10, 100, 1000)
+    # queries an operation expected to be constant may take on a big order
+    # on top of the ones taken on a small order (prefetching, ...)
+    QUERY_SLACK = 3
+    # queries per line an operation expected to be linear may take on a big
+    # order, relative to the queries per line taken on a small order
+    QUERY_RATIO = 1.5
+    # the biggest order may take at most that many times longer than the
+    # smallest one per line: loose enough for noisy machines, a quadratic
+    # operation would take about 100 times longer per line
+    TIME_TOLERANCE = 10
+    # timings under this are too noisy to be compared
+    MIN_TIME = 0.05
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env.ref("base.res_partner_1")
+        cls.product = cls.env.ref("product.product_product_4")
+        cls.orders = {size: cls._create_order(size) for size in cls.SIZES}
+        cls.env["sale.order"].browse(
+            [order.id for order in cls.orders.values()]
+        )._reset_sequence()
+
+    @classmethod
+    def _order_line_commands(cls, size):
+        """Commands for ``size`` lines: a section every 10 lines, a note
+        every 7 lines, products otherwise.
+        """
+        commands = []
+        for index in range(size):
+            if index % 10 == 0:
+                vals = {"display_type": "line_section", "name": "Section %s" % index}
+            elif index % 7 == 0:
+                vals = {"display_type": "line_note", "name": "Note %s" % index}
+            else:
+                vals = {
+                    "product_id": cls.product.id,
+                    "name": cls.product.name,
+                    "product_uom_qty": 1.0,
+                    "price_unit": cls.product.lst_price,
+                }
+            commands.append((0, 0, vals))
+        return commands
+
+    @classmethod
+    def _create_order(cls, size):
+        return cls.env["sale.order"].create(
+            {"partner_id": cls.partner.id, "order_line": cls._order_line_commands(size)}
+        )
+
+    def _count_queries(self, func, *args, **kwargs):
+        """Return the number of queries and the time taken by ``func``,
+        including flushing its pending writes, starting from an empty cache.
+        """
+        self.env["base"].flush()
+        self.env["base"].invalidate_cache()
+        queries = self.cr.sql_log_count
+        start = time.time()
+        func(*args, **kwargs)
+        self.env["base"].flush()
+        return self.cr.sql_log_count - queries, time.time() - start
+
+    def _assert_max_queries(self, max_count, func, *args, **kwargs):
+        """Run ``func`` under ``assertQueryCount`` and return its time."""
+        self.env["base"].flush()
+        self.env["base"].invalidate_cache()
+        start = time.time()
+        with self.assertQueryCount(max_count):
+            func(*args, **kwargs)
+        return time.time() - start
+
+    def assertLinearTime(self, timings):
+        """Check that the biggest size takes no more time per line than the
+        smallest one, give or take ``TIME_TOLERANCE``."""
+        small, big = self.SIZES[0], self.SIZES[-1]
+        self.assertLessEqual(
+            timings[big],
+            max(timings[small], self.MIN_TIME) * big / small * self.TIME_TOLERANCE,
+            "Time grows faster than the number of lines: %s" % timings,
+        )
+
+    def assertConstantQueries(self, func):
+        """Check that ``func(order)`` takes no more queries on the bigger
+        orders than on the smallest one, give or take ``QUERY_SLACK``, and
+        no more than linear time."""
+        timings = {}
+        smallest, timings[self.SIZES[0]] = self._count_queries(func, self.orders[self.SIZES[0]])
+        for size in self.SIZES[1:]:
+            timings[size] = self._assert_max_queries(smallest + self.QUERY_SLACK, func, self.orders[size])
+        self.assertLinearTime(timings)
+
+    def assertLinearQueries(self, func, args):
+        """Check that ``func(args[size])`` takes no more queries per line on
+        the bigger sizes than on the smallest one, give or take
+        ``QUERY_RATIO``, and no more than linear time."""
+        small = self.SIZES[0]
+        timings = {}
+        count, timings[small] = self._count_queries(func, args[small])
+        per_line = count / small
+        for size in self.SIZES[1:]:
+            timings[size] = self._assert_max_queries(int(per_line * size * self.QUERY_RATIO), func, args[size])
+        self.assertLinearTime(timings)
+
+    def test_gap_numbering(self):
+        order = self.orders[100]
+        order._reset_sequence()
+        lines = order.order_line.sorted(lambda line: (line.sequence, line.id))
+        self.assertEqual(lines.mapped("sequence"), lines.mapped("sequence2"))
+        self.assertEqual(lines.mapped("sequence2"), sorted(lines.mapped("sequence2")))
+        sections = lines.filtered(lambda line: line.display_type == "line_section")
+        self.assertEqual(
+            sections.mapped("sequence2"),
+            [1 + SECTION_SEQUENCE_STEP * rank for rank in range(1, len(sections) + 1)],
+        )
+        first_section = sections[0]
+        in_section = lines.filtered(
+            lambda line: line.display_type != "line_section"
+            and first_section.sequence2 < line.sequence2 < sections[1].sequence2
+        )
+        self.assertEqual(
+            in_section.mapped("sequence2"),
+            [
+                first_section.sequence2 + LINE_SEQUENCE_STEP * rank
+                for rank in range(1, len(in_section) + 1)
+            ],
+        )
+        self.assertEqual(order.max_line_sequence, max(lines.mapped("sequence")) + 1)
+
+    def test_create(self):
+        self.assertLinearQueries(
+            self.env["sale.order"].create,
+            {
+                size: {"partner_id": self.partner.id, "order_line": self._order_line_commands(size)}
+                for size in self.SIZES
+            },
+        )
+
+    def test_write_other_field(self):
+        self.assertConstantQueries(lambda order: order.write({"client_order_ref": "REF"}))
+
+    def test_write_order_line(self):
+        def move_first_line_last(order):
+            first_line = order.order_line.sorted("sequence")[0]
+            order.write(
+                {"order_line": [(1, first_line.id, {"sequence2": order.max_line_sequence})]}
+            )
+
+        self.assertConstantQueries(move_first_line_last)
+
+    def test_copy(self):
+        self.assertLinearQueries(lambda order: order.copy(), self.orders)
+        copy = self.orders[100].copy()
+        self.assertEqual(
+            copy.order_line.mapped("sequence2"),
+            self.orders[100].order_line.mapped("sequence2"),
+        )
+
+    def test_reset_sequence(self):
+        self.assertConstantQueries(lambda order: order._reset_sequence())
+
+    def test_resequence_lines(self):
+        self.assertConstantQueries(
+            lambda order: order.resequence_lines(list(reversed(order.order_line.ids)))
+        )
+
+    def test_add_line(self):
+        def add_line(order):
+            middle = order.order_line.sorted("sequence")[len(order.order_line) // 2]
+            wizard = (
+                self.env["add.section"]
+                .with_context(active_id=middle.id)
+                .create(
+                    {
+                        "order_id": order.id,
+                        "line_id": middle.id,
+                        "seq": middle.sequence2 + 1,
+                        "display_type": "note",
+                        "note": "Inserted",
+                    }
+                )
+            )
+            wizard.add_line()
+
+        self.assertConstantQueries(add_line)
+        order = self.orders[1000]
+        inserted = order.order_line.filtered(lambda line: line.name == "Inserted")
+        self.assertEqual(len(inserted), 1)
+        self.assertEqual(len(set(order.order_line.mapped("sequence2"))), len(order.order_line))